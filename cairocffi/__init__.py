@@ -11,6 +11,7 @@
 """
 
 import sys
+import threading
 import ctypes.util
 
 from . import constants
@@ -31,21 +32,6 @@ version_info = (1, 10, 0)
 def dlopen(ffi, *names):
     """Try various names for the same library, for different platforms."""
     for name in names:
-<<<<<<< HEAD
-        try:
-            return ffi.dlopen(name)
-        except OSError:
-            pass
-    # Re-raise the exception.
-    return ffi.dlopen(names[0])  # pragma: no cover
-
-
-ffi = FFI()
-ffi.cdef(constants._CAIRO_HEADERS)
-CAIRO_NAMES = ['libcairo.so.2', 'libcairo.2.dylib', 'libcairo-2.dll',
-               'cairo.dll', 'cairo','libcairo-2']
-cairo = dlopen(ffi, *CAIRO_NAMES)
-=======
         for lib_name in [name, 'lib' + name]:
             try:
                 path = ctypes.util.find_library(lib_name)
@@ -58,8 +44,33 @@ cairo = dlopen(ffi, *CAIRO_NAMES)
     raise OSError("dlopen() failed to load a library: %s" % ' / '.join(names))
 
 
+class _CairoLibrary(object):
+    """The cairo library opened in ABI mode, with some functions replaced
+    by their compiled API-mode version.
+
+    API-mode calls skip libffi and are several times faster.
+    Other functions are looked up once in the ABI-mode library.
+
+    """
+    def __init__(self, library, fast_library):
+        self._library = library
+        for name in dir(fast_library):
+            setattr(self, name, getattr(fast_library, name))
+
+    def __getattr__(self, name):
+        value = getattr(self._library, name)
+        setattr(self, name, value)
+        return value
+
+
 cairo = dlopen(ffi, 'cairo', 'cairo-2')
->>>>>>> refs/remotes/origin/master
+try:
+    # Only built with CAIROCFFI_API_MODE=1, see ffi_build.build_ffi_api.
+    from ._ffi_api import lib as _fast_library
+except ImportError:
+    pass
+else:
+    cairo = _CairoLibrary(cairo, _fast_library)
 
 
 class CairoError(Exception):
@@ -80,9 +91,18 @@ STATUS_TO_EXCEPTION = {
 }
 
 
+# Exceptions raised by callbacks that can only report a failure to cairo,
+# re-raised instead of the next error status in the same thread.
+_callback_errors = threading.local()
+
+
 def _check_status(status):
     """Take a cairo status code and raise an exception if/as appropriate."""
     if status != constants.STATUS_SUCCESS:
+        callback_error = getattr(_callback_errors, 'exception', None)
+        if callback_error is not None:
+            _callback_errors.exception = None
+            raise callback_error
         exception = STATUS_TO_EXCEPTION.get(status, CairoError)
         status_name = ffi.string(ffi.cast("cairo_status_t", status))
         message = 'cairo returned %s: %s' % (
@@ -119,18 +139,61 @@ def install_as_pycairo():
 
 
 # Implementation is in submodules, but public API is all here.
-
-from .surfaces import (Surface, ImageSurface, PDFSurface, PSSurface,
-                       SVGSurface, RecordingSurface, Win32Surface,
-                       Win32PrintingSurface)
-try:
-    from .xcb import XCBSurface
-except ImportError:
-    pass
-from .patterns import (Pattern, SolidPattern, SurfacePattern,
-                       Gradient, LinearGradient, RadialGradient)
-from .fonts import FontFace, ToyFontFace, ScaledFont, FontOptions
-from .context import Context
-from .matrix import Matrix
+# Submodules are imported when one of their names is first used,
+# so that importing cairocffi stays cheap for short-lived processes.
+
+_LAZY_ATTRIBUTES = dict(
+    (name, module_name)
+    for module_name, names in [
+        ('surfaces', 'Surface ImageSurface PDFSurface PSSurface SVGSurface '
+                     'RecordingSurface TeeSurface '
+                     'Win32Surface Win32PrintingSurface'),
+        ('xcb', 'XCBSurface'),
+        ('patterns', 'Pattern SolidPattern SurfacePattern Gradient '
+                     'LinearGradient RadialGradient RasterSourcePattern'),
+        ('fonts', 'FontFace ToyFontFace UserFontFace ScaledFont '
+                  'GlyphRun FontOptions glyph_dtype'),
+        ('context', 'Context GlyphAtlas'),
+        ('matrix', 'Matrix'),
+    ]
+    for name in [module_name] + names.split())
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(
+            'module %r has no attribute %r' % (__name__, name))
+    # Not importlib, which is not available on Python 2.6.
+    full_name = '%s.%s' % (__name__, module_name)
+    try:
+        __import__(full_name)
+    except ImportError:
+        # Optional backends, such as XCB without xcffib.
+        raise AttributeError(
+            'module %r has no attribute %r' % (__name__, name))
+    module = sys.modules[full_name]
+    value = getattr(module, name, module)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    # No module-level __getattr__, import everything now.
+    for _name in _LAZY_ATTRIBUTES:
+        try:
+            __getattr__(_name)
+        except AttributeError:
+            pass
 
 from .constants import *
+
+# Used by "from cairocffi import *", which does not call __getattr__.
+__all__ = sorted(
+    set(name for name in globals() if not name.startswith('_')) |
+    set(name for name, module_name in _LAZY_ATTRIBUTES.items()
+        if module_name != 'xcb'))
@@ -0,0 +1,182 @@
+# coding: utf-8
+"""
+    cairocffi.caching
+    ~~~~~~~~~~~~~~~~~
+
+    Size-bounded caches used by the memoizing parts of cairocffi.
+
+    :copyright: Copyright 2013 by Simon Sapin
+    :license: BSD, see LICENSE for details.
+
+"""
+
+import weakref
+from collections import namedtuple
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions size maxsize')
+
+
+class LRUCache(object):
+    """A mapping that keeps at most :obj:`maxsize` items,
+    discarding the least recently used ones first.
+
+    :param maxsize:
+        The maximum number of items, or :obj:`None` for no limit.
+    :type maxsize: int
+    :param maxweight:
+        The maximum total weight of items, or :obj:`None` for no limit.
+    :param weigh:
+        A function returning the weight of a value, such as its size in bytes.
+        Required with :obj:`maxweight`.
+
+    """
+    def __init__(self, maxsize=128, maxweight=None, weigh=None):
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self._weigh = weigh
+        # Maps keys to [previous, next, key, value] links
+        # of a circular list, from least to most recently used.
+        # (collections.OrderedDict is not available on Python 2.6.)
+        self._items = {}
+        self._root = root = []
+        root[:] = [root, root, None, None]
+        #: The current total weight of items.
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """Return the value for :obj:`key` and mark it as recently used,
+        or return :obj:`default` if there is no such key.
+
+        """
+        link = self._items.get(key)
+        if link is None:
+            self.misses += 1
+            return default
+        # Move to the most recent end.
+        previous, next_, _, value = link
+        previous[1] = next_
+        next_[0] = previous
+        root = self._root
+        last = root[0]
+        link[0] = last
+        link[1] = root
+        last[1] = root[0] = link
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._items:
+            self._remove(key)
+        root = self._root
+        last = root[0]
+        last[1] = root[0] = self._items[key] = [last, root, key, value]
+        if self._weigh is not None:
+            self.weight += self._weigh(value)
+        self._evict()
+
+    def _remove(self, key):
+        previous, next_, _, value = self._items.pop(key)
+        previous[1] = next_
+        next_[0] = previous
+        if self._weigh is not None:
+            self.weight -= self._weigh(value)
+
+    def _evict(self):
+        maxsize = self.maxsize
+        maxweight = self.maxweight
+        while self._items and (
+                (maxsize is not None and len(self._items) > maxsize) or
+                (maxweight is not None and self.weight > maxweight)):
+            self._remove(self._root[1][2])
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all items. Statistics are not reset."""
+        self._items.clear()
+        root = self._root
+        root[:] = [root, root, None, None]
+        self.weight = 0
+
+    def info(self):
+        """Return statistics about this cache.
+
+        :returns:
+            A ``(hits, misses, evictions, size, maxsize)`` named tuple.
+
+        """
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         len(self._items), self.maxsize)
+
+
+class InternTable(object):
+    """Return the same object for equal keys, as long as it is alive.
+
+    Objects are referenced weakly,
+    and the :obj:`maxsize` most recently requested ones also strongly
+    so that they survive between two requests.
+
+    :param maxsize:
+        The number of objects kept alive by this table.
+    :type maxsize: int
+
+    """
+    def __init__(self, maxsize=128):
+        self._objects = weakref.WeakValueDictionary()
+        self._recent = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, key, factory, freeze=None):
+        """Return the live object for :obj:`key`,
+        or create one by calling :obj:`factory` without arguments.
+
+        :param freeze:
+            If given, called with :obj:`key`
+            to get the key to store, in case :obj:`key` is mutable.
+
+        """
+        value = self._objects.get(key)
+        found = value is not None
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+            value = factory()
+        if freeze is not None:
+            # Never store the caller’s key, even on a hit:
+            # mutating it later would break eviction.
+            key = freeze(key)
+        if not found:
+            self._objects[key] = value
+        self._recent[key] = value
+        return value
+
+    def clear(self):
+        """Forget all objects. Statistics are not reset."""
+        self._objects.clear()
+        self._recent.clear()
+
+    def info(self):
+        """Return statistics about this table.
+
+        :returns:
+            A ``(hits, misses, evictions, size, maxsize)`` named tuple.
+            :obj:`evictions` counts objects that stopped being kept alive,
+            :obj:`size` counts live objects.
+
+        """
+        return CacheInfo(self.hits, self.misses, self._recent.evictions,
+                         len(self._objects), self._recent.maxsize)
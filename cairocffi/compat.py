@@ -33,6 +33,12 @@ except NameError:
     xrange = range
 
 
+try:
+    chr_ = unichr
+except NameError:
+    chr_ = chr
+
+
 if sys.version_info >= (3,):
     u = lambda x: x
 else:
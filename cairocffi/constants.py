@@ -210,6 +210,9 @@ PS_LEVEL_3 = 1
 SVG_VERSION_1_1 = 0
 SVG_VERSION_1_2 = 1
 
+SCRIPT_MODE_ASCII = 0
+SCRIPT_MODE_BINARY = 1
+
 _CAIRO_HEADERS = r"""
 
 int
@@ -1967,6 +1970,59 @@ cairo_svg_get_versions (cairo_svg_version_t const	**versions,
 const char *
 cairo_svg_version_to_string (cairo_svg_version_t version);
 
+cairo_surface_t *
+cairo_tee_surface_create (cairo_surface_t *master);
+
+void
+cairo_tee_surface_add (cairo_surface_t *surface,
+		       cairo_surface_t *target);
+
+void
+cairo_tee_surface_remove (cairo_surface_t *surface,
+			  cairo_surface_t *target);
+
+cairo_surface_t *
+cairo_tee_surface_index (cairo_surface_t *surface,
+			 unsigned int index);
+
+typedef enum {
+    CAIRO_SCRIPT_MODE_ASCII,
+    CAIRO_SCRIPT_MODE_BINARY
+} cairo_script_mode_t;
+
+cairo_device_t *
+cairo_script_create (const char *filename);
+
+cairo_device_t *
+cairo_script_create_for_stream (cairo_write_func_t	 write_func,
+				void			*closure);
+
+void
+cairo_script_write_comment (cairo_device_t *script,
+			    const char *comment,
+			    int len);
+
+void
+cairo_script_set_mode (cairo_device_t *script,
+		       cairo_script_mode_t mode);
+
+cairo_script_mode_t
+cairo_script_get_mode (cairo_device_t *script);
+
+cairo_surface_t *
+cairo_script_surface_create (cairo_device_t *script,
+			     cairo_content_t content,
+			     double width,
+			     double height);
+
+cairo_surface_t *
+cairo_script_surface_create_for_target (cairo_device_t *script,
+					cairo_surface_t *target);
+
+cairo_status_t
+cairo_script_from_recording_surface (cairo_device_t	*script,
+				     cairo_surface_t	*recording_surface);
+
 
         typedef void* HDC;
         typedef void* HFONT;
@@ -2106,3 +2162,84 @@ cairo_xcb_device_debug_get_precision (cairo_device_t *device);
 
 """
 
+_CAIRO_SCRIPT_INTERPRETER_HEADERS = r"""
+
+typedef struct _cairo_script_interpreter cairo_script_interpreter_t;
+
+typedef void
+(*csi_destroy_func_t) (void *closure,
+		       void *ptr);
+
+typedef cairo_surface_t *
+(*csi_surface_create_func_t) (void *closure,
+			      cairo_content_t content,
+			      double width,
+			      double height,
+			      long uid);
+typedef cairo_t *
+(*csi_context_create_func_t) (void *closure,
+			      cairo_surface_t *surface);
+typedef void
+(*csi_show_page_func_t) (void *closure,
+			 cairo_t *cr);
+
+typedef void
+(*csi_copy_page_func_t) (void *closure,
+			 cairo_t *cr);
+
+typedef cairo_surface_t *
+(*csi_create_source_image_t) (void *closure,
+			      cairo_format_t format,
+			      int width, int height,
+			      long uid);
+
+typedef struct _cairo_script_interpreter_hooks {
+    void *closure;
+    csi_surface_create_func_t surface_create;
+    csi_destroy_func_t surface_destroy;
+    csi_context_create_func_t context_create;
+    csi_destroy_func_t context_destroy;
+    csi_show_page_func_t show_page;
+    csi_copy_page_func_t copy_page;
+    csi_create_source_image_t create_source_image;
+} cairo_script_interpreter_hooks_t;
+
+cairo_script_interpreter_t *
+cairo_script_interpreter_create (void);
+
+void
+cairo_script_interpreter_install_hooks (cairo_script_interpreter_t *ctx,
+					const cairo_script_interpreter_hooks_t *hooks);
+
+cairo_status_t
+cairo_script_interpreter_run (cairo_script_interpreter_t *ctx,
+			      const char *filename);
+
+cairo_status_t
+cairo_script_interpreter_feed_stream (cairo_script_interpreter_t *ctx,
+				      FILE *stream);
+
+cairo_status_t
+cairo_script_interpreter_feed_string (cairo_script_interpreter_t *ctx,
+				      const char *line,
+				      int len);
+
+unsigned int
+cairo_script_interpreter_get_line_number (cairo_script_interpreter_t *ctx);
+
+cairo_script_interpreter_t *
+cairo_script_interpreter_reference (cairo_script_interpreter_t *ctx);
+
+cairo_status_t
+cairo_script_interpreter_finish (cairo_script_interpreter_t *ctx);
+
+cairo_status_t
+cairo_script_interpreter_destroy (cairo_script_interpreter_t *ctx);
+
+cairo_status_t
+cairo_script_interpreter_translate_stream (FILE *stream,
+	                                   cairo_write_func_t write_func,
+					   void *closure);
+
+"""
+
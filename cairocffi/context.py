@@ -10,11 +10,17 @@
 
 """
 
+from math import floor, ceil
+
 from . import ffi, cairo, _check_status, constants
 from .matrix import Matrix
 from .patterns import Pattern
-from .surfaces import Surface
-from .fonts import FontFace, ScaledFont, FontOptions, _encode_string
+from .surfaces import Surface, ImageSurface
+from .fonts import (FontFace, ScaledFont, FontOptions, GlyphRun,
+                    _encode_string, _encode_glyphs, _encode_clusters,
+                    _extents_tuple, _get_context_font_cache,
+                    _text_extents_many, _shape_cached)
+from .caching import LRUCache
 from .compat import xrange
 
 
@@ -1215,8 +1221,8 @@ class Context(object):
             See :meth:`show_text_glyphs` for the data structure.
 
         """
-        glyphs = ffi.new('cairo_glyph_t[]', glyphs)
-        cairo.cairo_glyph_path(self._pointer, glyphs, len(glyphs))
+        glyphs, num_glyphs = _encode_glyphs(glyphs)
+        cairo.cairo_glyph_path(self._pointer, glyphs, num_glyphs)
         self._check_status()
 
     def close_path(self):
@@ -1999,15 +2005,42 @@ class Context(object):
             as found in East-Asian languages.
 
         """
+        cache = _get_context_font_cache(self._pointer)
+        if cache is not None:
+            key = ('Context.text_extents', text)
+            result = cache.get(key)
+            if result is not None:
+                return result
         extents = ffi.new('cairo_text_extents_t *')
         cairo.cairo_text_extents(self._pointer, _encode_string(text), extents)
         self._check_status()
         # returning extents as is would be a nice API,
         # but return a tuple for compat with pycairo.
-        return (
-            extents.x_bearing, extents.y_bearing,
-            extents.width, extents.height,
-            extents.x_advance, extents.y_advance)
+        result = _extents_tuple(extents)
+        if cache is not None:
+            cache[key] = result
+        return result
+
+    def text_extents_many(self, strings):
+        """Return the extents of many strings at once.
+
+        This is equivalent to calling :meth:`text_extents` for each string,
+        but without allocating intermediate objects for each of them.
+
+        :param strings:
+            An iterable of Unicode or UTF-8 strings to measure.
+        :returns:
+            An :class:`array.array` of ``6 * N`` floats
+            for ``N`` strings, in rows of
+            ``(x_bearing, y_bearing, width, height, x_advance, y_advance)``.
+            ``numpy.frombuffer(result).reshape(-1, 6)``
+            gives a ``(N, 6)`` NumPy array without copying.
+
+        """
+        result = _text_extents_many(
+            cairo.cairo_text_extents, self._pointer, strings)
+        self._check_status()
+        return result
 
     def glyph_extents(self, glyphs):
         """Returns the extents for a list of glyphs.
@@ -2028,15 +2061,24 @@ class Context(object):
             See :meth:`text_extents` for details.
 
         """
-        glyphs = ffi.new('cairo_glyph_t[]', glyphs)
+        if isinstance(glyphs, (list, tuple)):
+            cache = _get_context_font_cache(self._pointer)
+        else:
+            cache = None
+        if cache is not None:
+            key = ('Context.glyph_extents', tuple(map(tuple, glyphs)))
+            result = cache.get(key)
+            if result is not None:
+                return result
+        glyphs, num_glyphs = _encode_glyphs(glyphs)
         extents = ffi.new('cairo_text_extents_t *')
         cairo.cairo_glyph_extents(
-            self._pointer, glyphs, len(glyphs), extents)
+            self._pointer, glyphs, num_glyphs, extents)
         self._check_status()
-        return (
-            extents.x_bearing, extents.y_bearing,
-            extents.width, extents.height,
-            extents.x_advance, extents.y_advance)
+        result = _extents_tuple(extents)
+        if cache is not None:
+            cache[key] = result
+        return result
 
     def show_text(self, text):
         """A drawing operator that generates the shape from a string text,
@@ -2076,7 +2118,35 @@ class Context(object):
         cairo.cairo_show_text(self._pointer, _encode_string(text))
         self._check_status()
 
-    def show_glyphs(self, glyphs):
+    def show_text_cached(self, text):
+        """Like :meth:`show_text`,
+        but draw with :meth:`show_text_glyphs`
+        from the glyphs and clusters cached by
+        :meth:`ScaledFont.cached_glyph_run`.
+
+        Repeated strings are converted to glyphs only once per scaled font,
+        and backends like PDF still get the text mapping
+        (so that text can be selected and searched in the output).
+        The current point is moved like with :meth:`show_text`.
+
+        :param text: The text to show, as an Unicode or UTF-8 string.
+
+        """
+        run, x_advance, y_advance = _shape_cached(
+            cairo.cairo_get_scaled_font(self._pointer), text)
+        xy = ffi.new('double[2]')
+        cairo.cairo_get_current_point(self._pointer, xy + 0, xy + 1)
+        x, y = xy
+        cairo.cairo_save(self._pointer)
+        cairo.cairo_translate(self._pointer, x, y)
+        cairo.cairo_show_text_glyphs(
+            self._pointer, run._text, -1, run._glyphs, run._num_glyphs,
+            run._clusters, run._num_clusters, run.cluster_flags)
+        cairo.cairo_restore(self._pointer)
+        cairo.cairo_move_to(self._pointer, x + x_advance, y + y_advance)
+        self._check_status()
+
+    def show_glyphs(self, glyphs, atlas=None):
         """A drawing operator that generates the shape from a list of glyphs,
         rendered according to the current
         font :meth:`face <set_font_face>`,
@@ -2087,13 +2157,19 @@ class Context(object):
         :param glyphs:
             The glyphs to show.
             See :meth:`show_text_glyphs` for the data structure.
+        :param atlas:
+            An optional :class:`GlyphAtlas`
+            to draw from cached glyph masks.
 
         """
-        glyphs = ffi.new('cairo_glyph_t[]', glyphs)
-        cairo.cairo_show_glyphs(self._pointer, glyphs, len(glyphs))
+        if atlas is not None:
+            atlas.show_glyphs(self, glyphs)
+            return
+        glyphs, num_glyphs = _encode_glyphs(glyphs)
+        cairo.cairo_show_glyphs(self._pointer, glyphs, num_glyphs)
         self._check_status()
 
-    def show_text_glyphs(self, text, glyphs, clusters, cluster_flags=0):
+    def show_text_glyphs(self, text, glyphs, clusters=None, cluster_flags=0):
         """This operation has rendering effects similar to :meth:`show_glyphs`
         but, if the target surface supports it
         (see :meth:`Surface.has_show_text_glyphs`),
@@ -2115,8 +2191,13 @@ class Context(object):
             The text to show, as an Unicode or UTF-8 string.
             Because of how :obj:`clusters` work,
             using UTF-8 bytes might be more convenient.
+            Can be :obj:`None` if :obj:`glyphs` is a :class:`GlyphRun`
+            created with its text.
         :param glyphs:
-            A list of glyphs.
+            A :class:`GlyphRun`,
+            a buffer such as a NumPy array of :func:`glyph_dtype`
+            (used in place, without copying),
+            or a list of glyphs.
             Each glyph is a ``(glyph_id, x, y)`` tuple.
             :obj:`glyph_id` is an opaque integer.
             Its exact interpretation depends on the font technology being used.
@@ -2141,6 +2222,8 @@ class Context(object):
             are not as well supported as normal clusters.
             For example, PDF rendering applications
             typically ignore those clusters when PDF text is being selected.
+            If omitted, the clusters of a :class:`GlyphRun` :obj:`glyphs`
+            are used, with its :obj:`cluster_flags`.
         :type cluster_flags: int
         :param cluster_flags:
             Flags (as a bit field) for the cluster mapping.
@@ -2153,11 +2236,23 @@ class Context(object):
             and following clusters move backward.
 
         """
-        glyphs = ffi.new('cairo_glyph_t[]', glyphs)
-        clusters = ffi.new('cairo_text_cluster_t[]', clusters)
+        if isinstance(glyphs, GlyphRun):
+            if text is None:
+                text = glyphs._text
+            if clusters is None:
+                clusters = glyphs._clusters
+                num_clusters = glyphs._num_clusters
+                cluster_flags = glyphs.cluster_flags
+        if clusters is None or text is None:
+            raise ValueError('show_text_glyphs() needs text and clusters')
+        if not isinstance(clusters, ffi.CData):
+            clusters, num_clusters = _encode_clusters(clusters)
+        if not isinstance(text, ffi.CData):
+            text = _encode_string(text)
+        glyphs, num_glyphs = _encode_glyphs(glyphs)
         cairo.cairo_show_text_glyphs(
-            self._pointer, _encode_string(text), -1,
-            glyphs, len(glyphs), clusters, len(clusters), cluster_flags)
+            self._pointer, text, -1,
+            glyphs, num_glyphs, clusters, num_clusters, cluster_flags)
         self._check_status()
 
     #
@@ -2191,3 +2286,146 @@ class Context(object):
         """
         cairo.cairo_copy_page(self._pointer)
         self._check_status()
+
+
+class GlyphAtlas(object):
+    """A cache of rasterized glyph masks
+    for drawing the same glyphs many times on image surfaces.
+
+    Each glyph is rendered once per scaled font and subpixel phase
+    into a small :obj:`FORMAT_A8 <FORMAT_A8>` :class:`ImageSurface`,
+    then composited with :meth:`Context.mask_surface`
+    for every later occurrence.
+    Pass an atlas to :meth:`Context.show_glyphs`::
+
+        atlas = GlyphAtlas()
+        for label, x, y in labels:
+            context.show_glyphs(
+                scaled_font.text_to_glyphs(x, y, label, False), atlas=atlas)
+
+    Only targets that are :class:`ImageSurface` objects
+    without a device scale use the atlas.
+    Other targets fall back to the normal :meth:`Context.show_glyphs`.
+
+    The output differs slightly from normal glyph rendering:
+    glyph positions are rounded to a fraction of a pixel
+    (see :obj:`subpixel_positions`),
+    and glyphs are composited one at a time,
+    so overlapping glyphs blend twice with a translucent source.
+
+    :param max_bytes:
+        The memory limit for cached masks.
+        The least recently used ones are discarded first.
+    :param subpixel_positions:
+        The number of distinct positions within a pixel
+        for which each glyph is rendered, in each direction.
+    :type max_bytes: int
+    :type subpixel_positions: int
+
+    """
+    def __init__(self, max_bytes=4 * 1024 * 1024, subpixel_positions=4):
+        self.subpixel_positions = subpixel_positions
+        self._masks = LRUCache(None, max_bytes, _mask_weight)
+
+    def info(self):
+        """Return statistics about the cached masks.
+
+        :returns:
+            A ``(hits, misses, evictions, size, maxsize)`` named tuple.
+
+        """
+        return self._masks.info()
+
+    def clear(self):
+        """Discard all cached masks."""
+        self._masks.clear()
+
+    def show_glyphs(self, context, glyphs):
+        """Draw :obj:`glyphs` on :obj:`context`, using cached masks.
+        See :meth:`Context.show_glyphs`.
+
+        """
+        target = context.get_target()
+        if not isinstance(target, ImageSurface) or (
+                cairo.cairo_version() >= 11400 and
+                target.get_device_scale() != (1, 1)):
+            context.show_glyphs(glyphs)
+            return
+        glyphs, num_glyphs = _encode_glyphs(glyphs)
+        scaled_font = context.get_scaled_font()
+        font_key = int(ffi.cast('uintptr_t', scaled_font._pointer))
+        xx, yx, xy, yy, x0, y0 = context.get_matrix().as_tuple()
+        phases = self.subpixel_positions
+        masks = self._masks
+        context.save()
+        try:
+            context.identity_matrix()
+            for i in xrange(num_glyphs):
+                glyph = glyphs[i]
+                index, x, y = glyph.index, glyph.x, glyph.y
+                device_x = xx * x + xy * y + x0
+                device_y = yx * x + yy * y + y0
+                pixel_x = floor(device_x)
+                pixel_y = floor(device_y)
+                phase_x = int((device_x - pixel_x) * phases)
+                phase_y = int((device_y - pixel_y) * phases)
+                key = (font_key, index, phase_x, phase_y)
+                entry = masks.get(key)
+                if entry is None:
+                    # Entries keep their font alive, so that its address
+                    # is not reused while it is part of a key.
+                    entry = _render_glyph_mask(
+                        scaled_font, index, (xx, yx, xy, yy),
+                        float(phase_x) / phases, float(phase_y) / phases
+                    ) + (scaled_font,)
+                    masks[key] = entry
+                mask, left, top, _ = entry
+                if mask is not None:
+                    context.mask_surface(mask, pixel_x + left, pixel_y + top)
+        finally:
+            context.restore()
+
+
+def _mask_weight(entry):
+    """Return the size in bytes of a :class:`GlyphAtlas` entry."""
+    mask = entry[0]
+    if mask is None:
+        return 0
+    return mask.get_stride() * mask.get_height()
+
+
+def _render_glyph_mask(scaled_font, index, linear, offset_x, offset_y):
+    """Render a glyph into a new A8 image surface,
+    with its origin at ``(offset_x, offset_y)`` within a pixel.
+
+    :returns:
+        A ``(mask, left, top)`` tuple,
+        where ``left`` and ``top`` are the mask’s position in pixels
+        relative to the pixel of the glyph origin.
+        ``mask`` is :obj:`None` for glyphs with no ink, such as spaces.
+
+    """
+    x_bearing, y_bearing, width, height, _, _ = scaled_font.glyph_extents(
+        [(index, 0, 0)])
+    if width <= 0 or height <= 0:
+        return None, 0, 0
+    xx, yx, xy, yy = linear
+    xs = []
+    ys = []
+    for x in (x_bearing, x_bearing + width):
+        for y in (y_bearing, y_bearing + height):
+            xs.append(xx * x + xy * y + offset_x)
+            ys.append(yx * x + yy * y + offset_y)
+    # One pixel of padding for antialiasing.
+    left = int(floor(min(xs))) - 1
+    top = int(floor(min(ys))) - 1
+    mask = ImageSurface(
+        constants.FORMAT_A8,
+        int(ceil(max(xs))) + 1 - left, int(ceil(max(ys))) + 1 - top)
+    context = Context(mask)
+    context.set_matrix(
+        Matrix(xx, yx, xy, yy, offset_x - left, offset_y - top))
+    context.set_scaled_font(scaled_font)
+    context.show_glyphs([(index, 0, 0)])
+    mask.flush()
+    return mask, left, top
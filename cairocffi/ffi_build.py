@@ -37,6 +37,14 @@ try:
 except ImportError:
     pass
 
+# cairo-script interpreter cffi definitions
+ffi_script = FFI()
+if hasattr(ffi_script, 'set_source'):
+    # PyPy < 2.6 compatibility
+    ffi_script.set_source('cairocffi._ffi_script', None)
+ffi_script.include(ffi)
+ffi_script.cdef(constants._CAIRO_SCRIPT_INTERPRETER_HEADERS)
+
 # gdk pixbuf cffi definitions
 ffi_pixbuf = FFI()
 if hasattr(ffi_pixbuf, 'set_source'):
@@ -52,6 +60,7 @@ ffi_pixbuf.cdef('''
     typedef int             gint;
     typedef gint            gboolean;
     typedef guint32         GQuark;
+    typedef unsigned long   gulong;
     typedef void*           gpointer;
     typedef ...             GdkPixbufLoader;
     typedef ...             GdkPixbufFormat;
@@ -64,6 +73,12 @@ ffi_pixbuf.cdef('''
     typedef enum {
         GDK_COLORSPACE_RGB
     } GdkColorspace;
+    typedef enum {
+        G_CONNECT_AFTER = 1,
+        G_CONNECT_SWAPPED = 2
+    } GConnectFlags;
+    typedef void (*GCallback) (void);
+    typedef void (*GClosureNotify) (gpointer data, gpointer closure);
 
 
     GdkPixbufLoader * gdk_pixbuf_loader_new          (void);
@@ -74,6 +89,8 @@ ffi_pixbuf.cdef('''
         GError **error);
     gboolean          gdk_pixbuf_loader_close        (
         GdkPixbufLoader *loader, GError **error);
+    void              gdk_pixbuf_loader_set_size     (
+        GdkPixbufLoader *loader, int width, int height);
 
     gchar *           gdk_pixbuf_format_get_name     (GdkPixbufFormat *format);
 
@@ -93,15 +110,105 @@ ffi_pixbuf.cdef('''
     void              gdk_cairo_set_source_pixbuf    (
         cairo_t *cr, const GdkPixbuf *pixbuf,
         double pixbuf_x, double pixbuf_y);
+    cairo_surface_t * gdk_cairo_surface_create_from_pixbuf (
+        const GdkPixbuf *pixbuf, int scale, void *for_window);
 
 
     void              g_object_ref                   (gpointer object);
     void              g_object_unref                 (gpointer object);
     void              g_error_free                   (GError *error);
     void              g_type_init                    (void);
+    gulong            g_signal_connect_data          (
+        gpointer instance, const gchar *detailed_signal, GCallback c_handler,
+        gpointer data, GClosureNotify destroy_data,
+        GConnectFlags connect_flags);
 ''')
 
 
+# Optional API-mode module, compiled against the cairo headers,
+# for the functions most often called in tight drawing loops.
+# Pointers are declared as void * so that this module accepts
+# the cdata of the main (ABI-mode) ffi, whose types it can not include.
+_CAIRO_FAST_CALLS_HEADERS = '''
+    int  cairo_status              (void *cr);
+    void cairo_save                (void *cr);
+    void cairo_restore             (void *cr);
+    void cairo_new_path            (void *cr);
+    void cairo_new_sub_path        (void *cr);
+    void cairo_close_path          (void *cr);
+    void cairo_move_to             (void *cr, double x, double y);
+    void cairo_rel_move_to         (void *cr, double dx, double dy);
+    void cairo_line_to             (void *cr, double x, double y);
+    void cairo_rel_line_to         (void *cr, double dx, double dy);
+    void cairo_curve_to            (void *cr, double x1, double y1,
+                                    double x2, double y2,
+                                    double x3, double y3);
+    void cairo_rel_curve_to        (void *cr, double dx1, double dy1,
+                                    double dx2, double dy2,
+                                    double dx3, double dy3);
+    void cairo_arc                 (void *cr, double xc, double yc,
+                                    double radius,
+                                    double angle1, double angle2);
+    void cairo_arc_negative        (void *cr, double xc, double yc,
+                                    double radius,
+                                    double angle1, double angle2);
+    void cairo_rectangle           (void *cr, double x, double y,
+                                    double width, double height);
+    void cairo_translate           (void *cr, double tx, double ty);
+    void cairo_scale               (void *cr, double sx, double sy);
+    void cairo_rotate              (void *cr, double angle);
+    void cairo_identity_matrix     (void *cr);
+    void cairo_set_source_rgb      (void *cr, double red, double green,
+                                    double blue);
+    void cairo_set_source_rgba     (void *cr, double red, double green,
+                                    double blue, double alpha);
+    void cairo_set_line_width      (void *cr, double width);
+    void cairo_stroke              (void *cr);
+    void cairo_stroke_preserve     (void *cr);
+    void cairo_fill                (void *cr);
+    void cairo_fill_preserve       (void *cr);
+    void cairo_paint               (void *cr);
+    void cairo_paint_with_alpha    (void *cr, double alpha);
+    void cairo_clip                (void *cr);
+    void cairo_clip_preserve       (void *cr);
+    void cairo_reset_clip          (void *cr);
+'''
+
+
+def _pkg_config(package):
+    """Return compiler arguments for :obj:`package`, with pkg-config."""
+    import subprocess
+    try:
+        with open(os.devnull, 'w') as devnull:
+            flags = subprocess.check_output(
+                ['pkg-config', '--cflags', '--libs', package],
+                stderr=devnull).decode().split()
+    except (OSError, subprocess.CalledProcessError):
+        return {'libraries': [package]}
+    return {
+        'include_dirs': [flag[2:] for flag in flags if flag[:2] == '-I'],
+        'library_dirs': [flag[2:] for flag in flags if flag[:2] == '-L'],
+        'libraries': [flag[2:] for flag in flags if flag[:2] == '-l'],
+    }
+
+
+def build_ffi_api():
+    """Return the FFI for the optional cairocffi._ffi_api module.
+
+    It is only built when the ``CAIROCFFI_API_MODE`` environment variable
+    is set when running setup.py, and requires the cairo headers.
+
+    """
+    ffi_api = FFI()
+    ffi_api.set_source(
+        'cairocffi._ffi_api', '#include <cairo.h>', **_pkg_config('cairo'))
+    ffi_api.cdef(_CAIRO_FAST_CALLS_HEADERS)
+    return ffi_api
+
+
 if __name__ == '__main__':
     ffi.compile()
+    ffi_script.compile()
     ffi_pixbuf.compile()
+    if os.environ.get('CAIROCFFI_API_MODE'):
+        build_ffi_api().compile()
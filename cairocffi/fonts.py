@@ -10,9 +10,121 @@
 
 """
 
-from . import ffi, cairo, _check_status, constants
+import weakref
+from math import floor, ceil
+from array import array
+
+from . import ffi, cairo, _check_status, constants, CairoError
 from .matrix import Matrix
-from .compat import xrange
+from .caching import LRUCache, InternTable
+from .compat import xrange, chr_
+
+
+FONT_FACE_CALLBACKS_KEY = ffi.new('cairo_user_data_key_t *')
+FONT_FACE_GLYPH_CACHE_KEY = ffi.new('cairo_user_data_key_t *')
+SCALED_FONT_CACHE_KEY = ffi.new('cairo_user_data_key_t *')
+ADVANCE_TABLE_KEY = ffi.new('cairo_user_data_key_t *')
+SHAPING_CACHE_KEY = ffi.new('cairo_user_data_key_t *')
+
+# Whether ScaledFont.enable_cache was ever called.
+# Until then, cache lookups are skipped without any FFI call.
+_scaled_font_caches_used = False
+
+#: The number of strings cached by :meth:`ScaledFont.cached_glyph_run`
+#: for each scaled font.
+SHAPING_CACHE_SIZE = 1024
+
+#: Interned objects for :meth:`ToyFontFace.get` and :meth:`ScaledFont.get`.
+INTERNED_FONT_FACES = InternTable(maxsize=64)
+INTERNED_SCALED_FONTS = InternTable(maxsize=256)
+
+
+def _get_scaled_font_data(pointer, key):
+    """Return the Python object attached to
+    a :c:type:`cairo_scaled_font_t *` pointer
+    by :func:`_set_scaled_font_data`, or :obj:`None`.
+
+    """
+    data = cairo.cairo_scaled_font_get_user_data(pointer, key)
+    if data != ffi.NULL:
+        return ffi.from_handle(data)
+
+
+def _set_scaled_font_data(pointer, key, value):
+    """Attach a Python object to a :c:type:`cairo_scaled_font_t *` pointer,
+    keeping it alive until cairo frees the scaled font.
+    :obj:`None` removes the object.
+
+    """
+    if value is None:
+        _check_status(cairo.cairo_scaled_font_set_user_data(
+            pointer, key, ffi.NULL, ffi.NULL))
+        return
+    handle = ffi.new_handle(value)
+    keep_alive = KeepAlive(handle)
+    _check_status(cairo.cairo_scaled_font_set_user_data(
+        pointer, key, handle, keep_alive.closure[1]))
+    keep_alive.save()
+
+
+def _get_scaled_font_cache(pointer):
+    """Return the :class:`LRUCache` attached
+    to a :c:type:`cairo_scaled_font_t *` pointer
+    by :meth:`ScaledFont.enable_cache`, or :obj:`None`.
+
+    """
+    if _scaled_font_caches_used:
+        return _get_scaled_font_data(pointer, SCALED_FONT_CACHE_KEY)
+
+
+def _get_context_font_cache(pointer):
+    """Like :func:`_get_scaled_font_cache`,
+    for the current scaled font of a :c:type:`cairo_t *` pointer.
+
+    """
+    if _scaled_font_caches_used:
+        return _get_scaled_font_data(
+            cairo.cairo_get_scaled_font(pointer), SCALED_FONT_CACHE_KEY)
+
+
+def _shape_cached(pointer, text):
+    """Return a ``(glyph_run, x_advance, y_advance)`` tuple for :obj:`text`
+    laid out at the origin with the scaled font at :obj:`pointer`,
+    from the cache attached to the scaled font if possible.
+
+    """
+    cache = _get_scaled_font_data(pointer, SHAPING_CACHE_KEY)
+    if cache is None:
+        cache = LRUCache(SHAPING_CACHE_SIZE)
+        _set_scaled_font_data(pointer, SHAPING_CACHE_KEY, cache)
+    entry = cache.get(text)
+    if entry is None:
+        scaled_font = ScaledFont._from_pointer(pointer, incref=True)
+        run = scaled_font.text_to_glyph_run(0, 0, text)
+        extents = scaled_font.glyph_extents(run)
+        entry = run, extents[4], extents[5]
+        cache[text] = entry
+    return entry
+
+
+def _extents_tuple(extents):
+    return (
+        extents.x_bearing, extents.y_bearing,
+        extents.width, extents.height,
+        extents.x_advance, extents.y_advance)
+
+
+def _text_extents_many(function, pointer, strings):
+    """Call :obj:`function` (one of the ``cairo_*_text_extents`` functions)
+    for each string and return the flat array of results.
+
+    """
+    strings = [string if isinstance(string, bytes) else string.encode('utf8')
+               for string in strings]
+    results = ffi.new('cairo_text_extents_t[]', len(strings))
+    for i, string in enumerate(strings):
+        function(pointer, string, results + i)
+    return array('d', ffi.buffer(results)[:])
 
 
 def _encode_string(string):
@@ -22,6 +134,37 @@ def _encode_string(string):
     return ffi.new('char[]', string)
 
 
+class KeepAlive(object):
+    """
+    Keep some objects alive until a callback is called.
+    :attr:`closure` is a tuple of cairo_destroy_func_t and void* cdata objects,
+    as expected by cairo_surface_set_mime_data().
+
+    Either :meth:`save` must be called before the callback,
+    or none of them must be called.
+
+    """
+    instances = set()
+
+    def __init__(self, *objects):
+        self.objects = objects
+        weakself = weakref.ref(self)
+
+        def closure(_):
+            value = weakself()
+            if value is not None:
+                value.instances.remove(value)
+
+        callback = ffi.callback(
+            'cairo_destroy_func_t', closure)
+        # cairo wants a non-NULL closure pointer.
+        self.closure = (callback, callback)
+
+    def save(self):
+        """Start keeping a reference to the passed objects."""
+        self.instances.add(self)
+
+
 class FontFace(object):
     """The base class for all font face types.
 
@@ -80,6 +223,22 @@ class ToyFontFace(FontFace):
         FontFace.__init__(self, cairo.cairo_toy_font_face_create(
             _encode_string(family), slant, weight))
 
+    @classmethod
+    def get(cls, family='', slant=constants.FONT_SLANT_NORMAL,
+            weight=constants.FONT_WEIGHT_NORMAL):
+        """Like :class:`ToyFontFace`,
+        but return the same object for the same arguments
+        while it is still alive,
+        instead of allocating a new wrapper every time.
+
+        The most recently used objects are kept alive,
+        up to ``INTERNED_FONT_FACES.maxsize``.
+
+        """
+        return INTERNED_FONT_FACES.get(
+            ('toy', family, slant, weight),
+            lambda: cls(family, slant, weight))
+
     def get_family(self):
         """Return this font face’s family name."""
         return ffi.string(cairo.cairo_toy_font_face_get_family(
@@ -94,8 +253,240 @@ class ToyFontFace(FontFace):
         return cairo.cairo_toy_font_face_get_weight(self._pointer)
 
 
+class UserFontFace(FontFace):
+    """Creates a font face whose glyphs are drawn by Python callbacks.
+    This is useful for icon fonts or custom symbol sets.
+
+    The callbacks receive a :class:`ScaledFont` and,
+    for :obj:`init` and :obj:`render_glyph`, a :class:`Context`.
+    That context is set up so that drawing is done in font space,
+    where the em-square is 1 unit by 1 unit
+    and the baseline is at ``y = 0``.
+
+    :param render_glyph:
+        Called as ``render_glyph(scaled_font, glyph, context)``
+        to draw the glyph with index :obj:`glyph` on :obj:`context`,
+        typically with :meth:`Context.fill`.
+        The source color of :obj:`context` should not be changed
+        as glyphs are used as masks.
+        Return the glyph’s horizontal advance in font space as a float,
+        or :obj:`None` to use the :obj:`max_x_advance` of the font extents.
+    :param init:
+        Called as ``init(scaled_font, context)``
+        when a scaled font is created for this face.
+        Return the font extents in font space as a
+        ``(ascent, descent, height, max_x_advance, max_y_advance)`` tuple,
+        or :obj:`None` to keep cairo’s defaults.
+    :param unicode_to_glyph:
+        Called as ``unicode_to_glyph(scaled_font, codepoint)``
+        with an integer Unicode codepoint.
+        Return the integer index of the glyph for that character.
+        If omitted, glyph indexes are the same as codepoints.
+    :param text_to_glyphs:
+        Called as ``text_to_glyphs(scaled_font, text, with_clusters)``
+        for more complex shaping.
+        Return :obj:`None` to fall back to :obj:`unicode_to_glyph`,
+        otherwise the same data structure as
+        :meth:`ScaledFont.text_to_glyphs`,
+        with glyph positions in font space relative to the origin.
+    :param glyph_cache_size:
+        The maximum number of rendered glyphs to remember.
+        See below.
+    :type glyph_cache_size: int
+
+    cairo already caches rendered glyphs for each :class:`ScaledFont`,
+    but may evict them or create new scaled fonts for the same size.
+    To avoid running :obj:`render_glyph` again in those cases,
+    the drawing operations for each glyph are recorded
+    the first time it is rendered at a given scale,
+    and replayed from then on.
+    As a consequence, :obj:`render_glyph` should draw the same thing
+    every time it is called with the same glyph and scale.
+    Recordings are bounded to one em around the em-square:
+    ink further away is clipped.
+    :attr:`glyph_cache` is the :class:`~cairocffi.caching.LRUCache`
+    holding these recordings.
+    It is attached to the cairo font face,
+    so that it is also available on objects returned by
+    :meth:`ScaledFont.get_font_face` or :meth:`Context.get_font_face`.
+
+    *New in cairo 1.8.*
+
+    """
+    def __init__(self, render_glyph, init=None, unicode_to_glyph=None,
+                 text_to_glyphs=None, glyph_cache_size=1024):
+        FontFace.__init__(self, cairo.cairo_user_font_face_create())
+        glyph_cache = LRUCache(glyph_cache_size)
+        callbacks = [_make_render_glyph_func(render_glyph, glyph_cache)]
+        cairo.cairo_user_font_face_set_render_glyph_func(
+            self._pointer, callbacks[-1])
+        if init is not None:
+            callbacks.append(_make_init_func(init))
+            cairo.cairo_user_font_face_set_init_func(
+                self._pointer, callbacks[-1])
+        if unicode_to_glyph is not None:
+            callbacks.append(_make_unicode_to_glyph_func(unicode_to_glyph))
+            cairo.cairo_user_font_face_set_unicode_to_glyph_func(
+                self._pointer, callbacks[-1])
+        if text_to_glyphs is not None:
+            callbacks.append(_make_text_to_glyphs_func(text_to_glyphs))
+            cairo.cairo_user_font_face_set_text_to_glyphs_func(
+                self._pointer, callbacks[-1])
+        self._check_status()
+        # The callbacks must live as long as the cairo font face,
+        # which can outlive this Python object.
+        # They must not reference it, or it would never be freed.
+        glyph_cache_handle = ffi.new_handle(glyph_cache)
+        keep_alive = KeepAlive(glyph_cache_handle, *callbacks)
+        _check_status(cairo.cairo_font_face_set_user_data(
+            self._pointer, FONT_FACE_CALLBACKS_KEY, *keep_alive.closure))
+        keep_alive.save()
+        _check_status(cairo.cairo_font_face_set_user_data(
+            self._pointer, FONT_FACE_GLYPH_CACHE_KEY, glyph_cache_handle,
+            ffi.NULL))
+
+    @property
+    def glyph_cache(self):
+        """The :class:`~cairocffi.caching.LRUCache` of recorded glyphs,
+        or :obj:`None` for user font faces not created by cairocffi.
+
+        """
+        data = cairo.cairo_font_face_get_user_data(
+            self._pointer, FONT_FACE_GLYPH_CACHE_KEY)
+        if data != ffi.NULL:
+            return ffi.from_handle(data)
+
+
+def _make_init_func(init):
+    """Return a CFFI callback for :class:`UserFontFace`’s :obj:`init`."""
+    from .context import Context  # Avoid a circular import
+
+    @ffi.callback('cairo_user_scaled_font_init_func_t',
+                  error=constants.STATUS_USER_FONT_ERROR)
+    def init_func(scaled_font, cr, extents):
+        font_extents = init(ScaledFont._from_pointer(scaled_font, incref=True),
+                            Context._from_pointer(cr, incref=True))
+        if font_extents is not None:
+            (extents.ascent, extents.descent, extents.height,
+             extents.max_x_advance, extents.max_y_advance) = font_extents
+        return constants.STATUS_SUCCESS
+    return init_func
+
+
+def _make_render_glyph_func(render_glyph, glyph_cache):
+    """Return a CFFI callback for :class:`UserFontFace`’s
+    :obj:`render_glyph`, memoized in :obj:`glyph_cache`.
+
+    """
+    # Avoid circular imports
+    from .context import Context
+    from .surfaces import RecordingSurface
+
+    @ffi.callback('cairo_user_scaled_font_render_glyph_func_t',
+                  error=constants.STATUS_USER_FONT_ERROR)
+    def render_glyph_func(scaled_font, glyph, cr, extents):
+        context = Context._from_pointer(cr, incref=True)
+        matrix = context.get_matrix()
+        key = (glyph, matrix.as_tuple())
+        cached = glyph_cache.get(key)
+        if cached is None:
+            # Record in device space, with the same state as cairo’s context.
+            # cairo can not use an unbounded recording as a source here.
+            recording = RecordingSurface(
+                constants.CONTENT_COLOR_ALPHA,
+                _glyph_recording_extents(matrix))
+            recording_context = Context(recording)
+            recording_context.set_matrix(matrix)
+            recording_context.set_source(context.get_source())
+            recording_context.set_font_matrix(context.get_font_matrix())
+            recording_context.set_font_options(context.get_font_options())
+            x_advance = render_glyph(
+                ScaledFont._from_pointer(scaled_font, incref=True),
+                glyph, recording_context)
+            cached = glyph_cache[key] = recording, x_advance
+        recording, x_advance = cached
+        context.save()
+        context.identity_matrix()
+        context.set_source_surface(recording)
+        context.paint()
+        context.restore()
+        if x_advance is not None:
+            extents.x_advance = x_advance
+        return constants.STATUS_SUCCESS
+    return render_glyph_func
+
+
+def _glyph_recording_extents(matrix):
+    """Return the ``(x, y, width, height)`` device space extents
+    of one em around the em-square, with the font space to device space
+    :obj:`matrix`, rounded out to whole pixels.
+
+    """
+    points = [matrix.transform_point(x, y)
+              for x in (-1, 2) for y in (-2, 1)]
+    left = floor(min(x for x, _ in points))
+    top = floor(min(y for _, y in points))
+    return (left, top,
+            ceil(max(x for x, _ in points)) - left,
+            ceil(max(y for _, y in points)) - top)
+
+
+def _make_unicode_to_glyph_func(unicode_to_glyph):
+    """Return a CFFI callback for :class:`UserFontFace`’s
+    :obj:`unicode_to_glyph`.
+
+    """
+    @ffi.callback('cairo_user_scaled_font_unicode_to_glyph_func_t',
+                  error=constants.STATUS_USER_FONT_ERROR)
+    def unicode_to_glyph_func(scaled_font, unicode, glyph_index):
+        glyph_index[0] = unicode_to_glyph(
+            ScaledFont._from_pointer(scaled_font, incref=True), unicode)
+        return constants.STATUS_SUCCESS
+    return unicode_to_glyph_func
+
+
+def _make_text_to_glyphs_func(text_to_glyphs):
+    """Return a CFFI callback for :class:`UserFontFace`’s
+    :obj:`text_to_glyphs`.
+
+    """
+    @ffi.callback('cairo_user_scaled_font_text_to_glyphs_func_t',
+                  error=constants.STATUS_USER_FONT_ERROR)
+    def text_to_glyphs_func(scaled_font, utf8, utf8_len, glyphs, num_glyphs,
+                            clusters, num_clusters, cluster_flags):
+        with_clusters = clusters != ffi.NULL
+        result = text_to_glyphs(
+            ScaledFont._from_pointer(scaled_font, incref=True),
+            ffi.string(utf8, utf8_len).decode('utf8'), with_clusters)
+        if result is None:
+            return constants.STATUS_USER_FONT_NOT_IMPLEMENTED
+        if with_clusters:
+            result, cluster_list, cluster_flags[0] = result
+            # cairo frees the array with cairo_text_cluster_free
+            # if it is not the one it passed.
+            if len(cluster_list) > num_clusters[0]:
+                clusters[0] = cairo.cairo_text_cluster_allocate(
+                    len(cluster_list))
+            num_clusters[0] = len(cluster_list)
+            for i, (num_bytes, cluster_num_glyphs) in enumerate(cluster_list):
+                cluster = clusters[0][i]
+                cluster.num_bytes = num_bytes
+                cluster.num_glyphs = cluster_num_glyphs
+        if len(result) > num_glyphs[0]:
+            glyphs[0] = cairo.cairo_glyph_allocate(len(result))
+        num_glyphs[0] = len(result)
+        for i, (index, x, y) in enumerate(result):
+            glyph = glyphs[0][i]
+            glyph.index = index
+            glyph.x = x
+            glyph.y = y
+        return constants.STATUS_SUCCESS
+    return text_to_glyphs_func
+
+
 FONT_TYPE_TO_CLASS = {
     constants.FONT_TYPE_TOY: ToyFontFace,
+    constants.FONT_TYPE_USER: UserFontFace,
 }
 
 
@@ -136,6 +527,31 @@ class ScaledFont(object):
             font_face._pointer, font_matrix._pointer,
             ctm._pointer, options._pointer))
 
+    @classmethod
+    def get(cls, font_face, font_matrix=None, ctm=None, options=None):
+        """Like :class:`ScaledFont`,
+        but return the same object for equal arguments
+        while it is still alive,
+        instead of allocating a new wrapper every time.
+
+        Arguments are compared by value:
+        the identity of the underlying cairo font face,
+        the components of the matrices and :class:`FontOptions` equality.
+        The most recently used objects are kept alive,
+        up to ``INTERNED_SCALED_FONTS.maxsize``.
+
+        """
+        # A live scaled font references its font face,
+        # so the address can not be reused while the entry exists.
+        key = (
+            'scaled', int(ffi.cast('uintptr_t', font_face._pointer)),
+            font_matrix.as_tuple() if font_matrix is not None else None,
+            ctm.as_tuple() if ctm is not None else None,
+            options)
+        return INTERNED_SCALED_FONTS.get(
+            key, lambda: cls(font_face, font_matrix, ctm, options),
+            freeze=_freeze_scaled_font_key)
+
     def _init_pointer(self, pointer):
         self._pointer = ffi.gc(pointer, cairo.cairo_scaled_font_destroy)
         self._check_status()
@@ -226,6 +642,161 @@ class ScaledFont(object):
         self._check_status()
         return matrix
 
+    def enable_cache(self, maxsize=1024):
+        """Start memoizing the results of :meth:`text_extents`,
+        :meth:`glyph_extents` and :meth:`text_to_glyphs`
+        (and of the same methods on :class:`Context`
+        while this is its current scaled font).
+
+        Scaled fonts are immutable, so cached results never get stale.
+        The cache is attached to the underlying cairo object:
+        it is shared by every :class:`ScaledFont` wrapping it,
+        such as those returned by :meth:`Context.get_scaled_font`,
+        and is freed with it.
+        Enabling again replaces the cache with an empty one.
+
+        :param maxsize:
+            The maximum number of cached results,
+            the least recently used being discarded first.
+            :obj:`None` means no limit.
+        :type maxsize: int
+
+        """
+        global _scaled_font_caches_used
+        _scaled_font_caches_used = True
+        _set_scaled_font_data(
+            self._pointer, SCALED_FONT_CACHE_KEY, LRUCache(maxsize))
+
+    def disable_cache(self):
+        """Stop memoizing results and free the cache.
+        See :meth:`enable_cache`.
+
+        """
+        _set_scaled_font_data(self._pointer, SCALED_FONT_CACHE_KEY, None)
+
+    def cache_info(self):
+        """Return statistics about the cache, if enabled.
+
+        :returns:
+            A ``(hits, misses, evictions, size, maxsize)`` named tuple,
+            or :obj:`None` if :meth:`enable_cache` was not called.
+
+        """
+        cache = _get_scaled_font_cache(self._pointer)
+        if cache is not None:
+            return cache.info()
+
+    def advance_table(self):
+        """Return the horizontal advances of characters in this font.
+
+        The table is built on first use for printable ASCII characters,
+        and extended by :meth:`measure_many` as other characters are seen.
+        It is attached to the underlying cairo object,
+        so every :class:`ScaledFont` wrapping it shares the same table.
+
+        :returns:
+            A dictionary mapping single Unicode characters
+            to their advance in the X direction, in user-space units.
+            The value is :obj:`None` for characters
+            that do not map to exactly one glyph.
+
+        """
+        table = _get_scaled_font_data(self._pointer, ADVANCE_TABLE_KEY)
+        if table is None:
+            table = {}
+            self._add_advances(table, [
+                chr_(codepoint) for codepoint in xrange(0x20, 0x7F)])
+            _set_scaled_font_data(self._pointer, ADVANCE_TABLE_KEY, table)
+        return table
+
+    def _add_advances(self, table, characters):
+        """Measure :obj:`characters` with a single :meth:`text_to_glyphs`
+        call and store their advances in :obj:`table`.
+
+        """
+        characters = list(characters)
+        for character in characters:
+            table[character] = None
+        if self._has_custom_text_to_glyphs():
+            # The glyphs of a character may depend on its neighbors.
+            return
+        try:
+            lengths = [len(character.encode('utf8'))
+                       for character in characters]
+            run = self.text_to_glyph_run(0, 0, ''.join(characters))
+        except (UnicodeError, CairoError):
+            return
+        if run.cluster_flags & constants.TEXT_CLUSTER_FLAG_BACKWARD:
+            return
+        extents = ffi.new('cairo_text_extents_t *')
+        character_index = 0
+        glyph_index = 0
+        for i in xrange(run._num_clusters):
+            cluster = run._clusters[i]
+            first = character_index
+            num_bytes = cluster.num_bytes
+            while num_bytes > 0 and character_index < len(characters):
+                num_bytes -= lengths[character_index]
+                character_index += 1
+            if character_index == first + 1 and cluster.num_glyphs == 1:
+                cairo.cairo_scaled_font_glyph_extents(
+                    self._pointer, run._glyphs + glyph_index, 1, extents)
+                table[characters[first]] = extents.x_advance
+            glyph_index += cluster.num_glyphs
+        self._check_status()
+
+    def _has_custom_text_to_glyphs(self):
+        """Whether this is a user font with a ``text_to_glyphs`` callback."""
+        return cairo.cairo_scaled_font_get_type(self._pointer) == (
+            constants.FONT_TYPE_USER) and (
+            cairo.cairo_user_font_face_get_text_to_glyphs_func(
+                cairo.cairo_scaled_font_get_font_face(self._pointer))
+            != ffi.NULL)
+
+    def measure_many(self, strings, exact=False):
+        """Return the advance widths of many strings,
+        using :meth:`advance_table` instead of calling cairo for each string.
+
+        This is useful for line breaking,
+        where many candidate substrings are measured.
+
+        A width is the sum of the advances of its characters.
+        cairo’s "toy" text API lays out each character independently,
+        so this matches the :obj:`x_advance` of :meth:`text_extents`,
+        up to floating point rounding.
+        Strings with characters that do not map to exactly one glyph,
+        and all strings with a :class:`UserFontFace`
+        that has a ``text_to_glyphs`` callback (which may kern or shape text),
+        are measured with :meth:`text_extents` instead.
+
+        :param strings: An iterable of Unicode or UTF-8 strings.
+        :param exact:
+            If true, measure every string with :meth:`text_extents`.
+        :type exact: bool
+        :returns: A list of floats.
+
+        """
+        if exact:
+            return [self.text_extents(string)[4] for string in strings]
+        table = self.advance_table()
+        get_advance = table.__getitem__
+        widths = []
+        for string in strings:
+            text = (string.decode('utf8') if isinstance(string, bytes)
+                    else string)
+            try:
+                widths.append(sum(map(get_advance, text), 0.))
+                continue
+            except KeyError:
+                self._add_advances(table, set(text).difference(table))
+            except TypeError:  # Some advance is None.
+                pass
+            if all(table[character] is not None for character in text):
+                widths.append(sum(map(get_advance, text), 0.))
+            else:
+                widths.append(self.text_extents(string)[4])
+        return widths
+
     def extents(self):
         """Return the scaled font’s extents.
         See :meth:`Context.font_extents`.
@@ -259,14 +830,41 @@ class ScaledFont(object):
             See :meth:`Context.text_extents` for details.
 
         """
+        cache = _get_scaled_font_cache(self._pointer)
+        if cache is not None:
+            key = ('text_extents', text)
+            result = cache.get(key)
+            if result is not None:
+                return result
         extents = ffi.new('cairo_text_extents_t *')
         cairo.cairo_scaled_font_text_extents(
             self._pointer, _encode_string(text), extents)
         self._check_status()
-        return (
-            extents.x_bearing, extents.y_bearing,
-            extents.width, extents.height,
-            extents.x_advance, extents.y_advance)
+        result = _extents_tuple(extents)
+        if cache is not None:
+            cache[key] = result
+        return result
+
+    def text_extents_many(self, strings):
+        """Return the extents of many strings at once.
+
+        This is equivalent to calling :meth:`text_extents` for each string,
+        but without allocating intermediate objects for each of them.
+
+        :param strings:
+            An iterable of Unicode or UTF-8 strings to measure.
+        :returns:
+            An :class:`array.array` of ``6 * N`` floats
+            for ``N`` strings, in rows of
+            ``(x_bearing, y_bearing, width, height, x_advance, y_advance)``.
+            ``numpy.frombuffer(result).reshape(-1, 6)``
+            gives a ``(N, 6)`` NumPy array without copying.
+
+        """
+        result = _text_extents_many(
+            cairo.cairo_scaled_font_text_extents, self._pointer, strings)
+        self._check_status()
+        return result
 
     def glyph_extents(self, glyphs):
         """Returns the extents for a list of glyphs.
@@ -282,21 +880,31 @@ class ScaledFont(object):
             A list of glyphs, as returned by :meth:`text_to_glyphs`.
             Each glyph is a ``(glyph_id, x, y)`` tuple
             of an integer and two floats.
+            A :class:`GlyphRun` is also accepted.
         :returns:
             A ``(x_bearing, y_bearing, width, height, x_advance, y_advance)``
             tuple of floats.
             See :meth:`Context.text_extents` for details.
 
         """
-        glyphs = ffi.new('cairo_glyph_t[]', glyphs)
+        cache = _get_scaled_font_cache(self._pointer)
+        # Only lists of tuples are cached: other types may be mutable buffers.
+        if cache is not None and isinstance(glyphs, (list, tuple)):
+            key = ('glyph_extents', tuple(map(tuple, glyphs)))
+            result = cache.get(key)
+            if result is not None:
+                return result
+        else:
+            cache = None
+        glyphs, num_glyphs = _encode_glyphs(glyphs)
         extents = ffi.new('cairo_text_extents_t *')
         cairo.cairo_scaled_font_glyph_extents(
-            self._pointer, glyphs, len(glyphs), extents)
+            self._pointer, glyphs, num_glyphs, extents)
         self._check_status()
-        return (
-            extents.x_bearing, extents.y_bearing,
-            extents.width, extents.height,
-            extents.x_advance, extents.y_advance)
+        result = _extents_tuple(extents)
+        if cache is not None:
+            cache[key] = result
+        return result
 
     def text_to_glyphs(self, x, y, text, with_clusters):
         """Converts a string of text to a list of glyphs,
@@ -332,6 +940,61 @@ class ScaledFont(object):
             and :meth:`Context.show_glyphs`
             for the "real" text display API in cairo.
 
+        """
+        cache = _get_scaled_font_cache(self._pointer)
+        if cache is not None:
+            key = ('text_to_glyphs', x, y, text, bool(with_clusters))
+            result = cache.get(key)
+            if result is None:
+                result = self._text_to_glyphs(x, y, text, with_clusters)
+                cache[key] = result
+            # Return new lists, the cached ones could be modified.
+            if with_clusters:
+                glyphs, clusters, cluster_flags = result
+                return list(glyphs), list(clusters), cluster_flags
+            else:
+                return list(result)
+        return self._text_to_glyphs(x, y, text, with_clusters)
+
+    def cached_glyph_run(self, text):
+        """Return the :class:`GlyphRun` for :obj:`text` placed at the origin,
+        with its clusters, from a cache.
+
+        The cache is attached to the underlying cairo object,
+        holds up to :data:`SHAPING_CACHE_SIZE` strings
+        (the least recently used being discarded first)
+        and is also used by :meth:`Context.show_text_cached`.
+        The returned run is shared: use :meth:`GlyphRun.copy`
+        before modifying it.
+
+        :param text: An Unicode or UTF-8 string.
+        :returns: A :class:`GlyphRun` object.
+
+        """
+        return _shape_cached(self._pointer, text)[0]
+
+    def _text_to_glyphs(self, x, y, text, with_clusters):
+        run = self.text_to_glyph_run(x, y, text, with_clusters)
+        if with_clusters:
+            return run.get_glyphs(), run.get_clusters(), run.cluster_flags
+        else:
+            return run.get_glyphs()
+
+    def text_to_glyph_run(self, x, y, text, with_clusters=True):
+        """Like :meth:`text_to_glyphs`,
+        but keep the result in the memory allocated by cairo
+        instead of converting it to Python lists.
+
+        :type x: float
+        :type y: float
+        :type with_clusters: bool
+        :param x: X position to place first glyph.
+        :param y: Y position to place first glyph.
+        :param text: The text to convert, as an Unicode or UTF-8 string.
+        :param with_clusters: Whether to compute the cluster mapping.
+        :returns:
+            A new :class:`GlyphRun` object, that also keeps :obj:`text`.
+
         """
         glyphs = ffi.new('cairo_glyph_t **', ffi.NULL)
         num_glyphs = ffi.new('int *')
@@ -343,26 +1006,283 @@ class ScaledFont(object):
             clusters = ffi.NULL
             num_clusters = ffi.NULL
             cluster_flags = ffi.NULL
+        text = _encode_string(text)
         # TODO: Pass len_utf8 explicitly to support NULL bytes?
         status = cairo.cairo_scaled_font_text_to_glyphs(
-            self._pointer, x, y, _encode_string(text), -1,
+            self._pointer, x, y, text, -1,
             glyphs, num_glyphs, clusters, num_clusters, cluster_flags)
         glyphs = ffi.gc(glyphs[0], cairo.cairo_glyph_free)
         if with_clusters:
             clusters = ffi.gc(clusters[0], cairo.cairo_text_cluster_free)
         _check_status(status)
-        glyphs = [
-            (glyph.index, glyph.x, glyph.y)
-            for i in xrange(num_glyphs[0])
-            for glyph in [glyphs[i]]]
+        run = object.__new__(GlyphRun)
         if with_clusters:
-            clusters = [
-                (cluster.num_bytes, cluster.num_glyphs)
-                for i in xrange(num_clusters[0])
-                for cluster in [clusters[i]]]
-            return glyphs, clusters, cluster_flags[0]
+            run._init_arrays(glyphs, num_glyphs[0], clusters, num_clusters[0],
+                             cluster_flags[0], text)
+        else:
+            run._init_arrays(glyphs, num_glyphs[0], None, 0, 0, text)
+        return run
+
+
+def _freeze_scaled_font_key(key):
+    """Copy the mutable :class:`FontOptions` of a :meth:`ScaledFont.get` key.
+    """
+    options = key[-1]
+    return key[:-1] + (options.copy() if options is not None else None,)
+
+
+def _encode_glyphs(glyphs):
+    """Take a :class:`GlyphRun`, a buffer in the ``cairo_glyph_t`` layout
+    or an iterable of ``(glyph_id, x, y)`` tuples
+    and return a ``(cairo_glyph_t *, num_glyphs)`` tuple.
+
+    The pointer can be used as long as both it and :obj:`glyphs` live.
+    Buffers are not copied.
+
+    """
+    if isinstance(glyphs, GlyphRun):
+        return glyphs._glyphs, glyphs._num_glyphs
+    if not isinstance(glyphs, (list, tuple)):
+        try:
+            buffer = ffi.from_buffer(glyphs)
+        except TypeError:
+            glyphs = list(glyphs)
+        else:
+            _check_glyph_layout(glyphs)
+            num_glyphs = len(buffer) // ffi.sizeof('cairo_glyph_t')
+            return ffi.cast('cairo_glyph_t *', buffer), num_glyphs
+    glyphs = ffi.new('cairo_glyph_t[]', glyphs)
+    return glyphs, len(glyphs)
+
+
+def _check_glyph_layout(buffer):
+    """Raise :exc:`TypeError` unless the items of :obj:`buffer`
+    have the memory layout of ``cairo_glyph_t``.
+
+    """
+    dtype = getattr(buffer, 'dtype', None)
+    if dtype is not None:  # Probably a NumPy array
+        matches = dtype == glyph_dtype()
+    else:
+        matches = (
+            memoryview(buffer).itemsize == ffi.sizeof('cairo_glyph_t'))
+    if not matches:
+        raise TypeError(
+            'Expected a buffer of cairo_glyph_t items, '
+            'such as a NumPy array with glyph_dtype(), got %r' % buffer)
+
+
+def _copy_glyphs(glyphs):
+    """Like :func:`_encode_glyphs`,
+    but always return a new array that does not depend on :obj:`glyphs`.
+
+    """
+    pointer, num_glyphs = _encode_glyphs(glyphs)
+    if not isinstance(glyphs, GlyphRun) and (
+            ffi.typeof(pointer).kind == 'array'):
+        return pointer, num_glyphs  # Already a new array.
+    array = ffi.new('cairo_glyph_t[]', num_glyphs)
+    if num_glyphs:
+        ffi.buffer(array)[:] = ffi.buffer(pointer, ffi.sizeof(array))
+    return array, num_glyphs
+
+
+def glyph_dtype():
+    """Return the NumPy dtype matching the memory layout of cairo glyphs,
+    for the buffers accepted by :meth:`Context.show_glyphs`
+    and related methods.
+
+    This is equivalent to::
+
+        numpy.dtype([('index', 'L'), ('x', 'f8'), ('y', 'f8')], align=True)
+
+    :raises: :exc:`ImportError` if NumPy is not installed.
+
+    """
+    import numpy
+    dtype = numpy.dtype(
+        [('index', 'L'), ('x', 'f8'), ('y', 'f8')], align=True)
+    assert dtype.itemsize == ffi.sizeof('cairo_glyph_t')
+    return dtype
+
+
+def _encode_clusters(clusters):
+    """Like :func:`_encode_glyphs`, for a list of clusters."""
+    clusters = ffi.new('cairo_text_cluster_t[]', clusters)
+    return clusters, len(clusters)
+
+
+class GlyphRun(object):
+    """A list of glyphs and an optional cluster mapping,
+    kept in C memory in the format cairo expects.
+
+    :meth:`Context.show_glyphs`, :meth:`Context.show_text_glyphs`,
+    :meth:`Context.glyph_path`, :meth:`Context.glyph_extents`
+    and :meth:`ScaledFont.glyph_extents`
+    use a :class:`GlyphRun` as-is,
+    instead of converting a list of tuples on every call.
+    Runs are usually obtained from :meth:`ScaledFont.text_to_glyph_run`.
+
+    :param glyphs:
+        A list of ``(glyph_id, x, y)`` tuples.
+        See :meth:`Context.show_text_glyphs` for the data structure.
+    :param clusters:
+        An optional list of ``(num_bytes, num_glyphs)`` tuples.
+    :param cluster_flags:
+        Flags (as a bit field) for the cluster mapping.
+    :param text:
+        The optional text that :obj:`clusters` map to,
+        as an Unicode or UTF-8 string.
+
+    """
+    def __init__(self, glyphs, clusters=None, cluster_flags=0, text=None):
+        glyphs, num_glyphs = _copy_glyphs(glyphs)
+        if clusters is not None:
+            clusters, num_clusters = _encode_clusters(list(clusters))
+        else:
+            num_clusters = 0
+        if text is not None:
+            text = _encode_string(text)
+        self._init_arrays(glyphs, num_glyphs, clusters, num_clusters,
+                          cluster_flags, text)
+
+    @classmethod
+    def from_arrays(cls, indices, xs, ys):
+        """Create a run from separate sequences
+        of glyph ids and X and Y positions,
+        such as the NumPy arrays of a text layout engine.
+
+        With NumPy installed, each sequence is copied in bulk.
+
+        :param indices: A sequence of integer glyph ids.
+        :param xs: A sequence of float X positions.
+        :param ys: A sequence of float Y positions.
+        :returns: A new :class:`GlyphRun` object, without clusters.
+
+        """
+        num_glyphs = len(indices)
+        if len(xs) != num_glyphs or len(ys) != num_glyphs:
+            raise ValueError('indices, xs and ys must have the same length')
+        glyphs = ffi.new('cairo_glyph_t[]', num_glyphs)
+        try:
+            dtype = glyph_dtype()
+        except ImportError:
+            for i in xrange(num_glyphs):
+                glyph = glyphs[i]
+                glyph.index = indices[i]
+                glyph.x = xs[i]
+                glyph.y = ys[i]
+        else:
+            import numpy
+            if num_glyphs:
+                view = numpy.frombuffer(ffi.buffer(glyphs), dtype)
+                view['index'] = indices
+                view['x'] = xs
+                view['y'] = ys
+        run = object.__new__(cls)
+        run._init_arrays(glyphs, num_glyphs, None, 0, 0, None)
+        return run
+
+    def _init_arrays(self, glyphs, num_glyphs, clusters, num_clusters,
+                     cluster_flags, text):
+        self._glyphs = glyphs
+        self._num_glyphs = num_glyphs
+        self._clusters = clusters
+        self._num_clusters = num_clusters
+        #: The cluster flags, as a bit field.
+        self.cluster_flags = cluster_flags
+        self._text = text
+
+    def __len__(self):
+        return self._num_glyphs
+
+    def __iter__(self):
+        glyphs = self._glyphs
+        for i in xrange(self._num_glyphs):
+            glyph = glyphs[i]
+            yield glyph.index, glyph.x, glyph.y
+
+    @property
+    def text(self):
+        """The UTF-8 text of this run as a byte string, or :obj:`None`."""
+        if self._text is not None:
+            return ffi.string(self._text)
+
+    def has_clusters(self):
+        """Return whether this run has a cluster mapping."""
+        return self._clusters is not None
+
+    def get_glyphs(self):
+        """Return the glyphs as a list of ``(glyph_id, x, y)`` tuples."""
+        return list(self)
+
+    def get_clusters(self):
+        """Return the clusters as a list of ``(num_bytes, num_glyphs)`` tuples,
+        or :obj:`None` if this run has no cluster mapping.
+
+        """
+        if self._clusters is None:
+            return None
+        clusters = self._clusters
+        return [
+            (cluster.num_bytes, cluster.num_glyphs)
+            for i in xrange(self._num_clusters)
+            for cluster in [clusters[i]]]
+
+    def translate(self, dx, dy):
+        """Move every glyph of this run, in place.
+
+        This is cheaper than building a new run
+        when the same text is drawn at many positions::
+
+            run = scaled_font.text_to_glyph_run(0, 0, 'label')
+            x0 = y0 = 0
+            for x, y in positions:
+                run.translate(x - x0, y - y0)
+                context.show_glyphs(run)
+                x0, y0 = x, y
+
+        With NumPy installed, all positions are updated in bulk.
+
+        :param dx: Offset in the X direction.
+        :param dy: Offset in the Y direction.
+        :type dx: float
+        :type dy: float
+
+        """
+        glyphs = self._glyphs
+        num_glyphs = self._num_glyphs
+        if not num_glyphs:
+            return
+        try:
+            dtype = glyph_dtype()
+        except ImportError:
+            for i in xrange(num_glyphs):
+                glyph = glyphs[i]
+                glyph.x += dx
+                glyph.y += dy
+        else:
+            import numpy
+            view = numpy.frombuffer(
+                ffi.buffer(glyphs, num_glyphs * dtype.itemsize), dtype)
+            view['x'] += dx
+            view['y'] += dy
+
+    def copy(self):
+        """Return a new, independent :class:`GlyphRun` with the same content.
+        """
+        glyphs, num_glyphs = _copy_glyphs(self)
+        if self._clusters is not None:
+            clusters = ffi.new('cairo_text_cluster_t[]', self._num_clusters)
+            if self._num_clusters:
+                ffi.buffer(clusters)[:] = ffi.buffer(
+                    self._clusters, ffi.sizeof(clusters))
         else:
-            return glyphs
+            clusters = None
+        run = object.__new__(GlyphRun)
+        run._init_arrays(glyphs, num_glyphs, clusters,
+                         self._num_clusters, self.cluster_flags, self._text)
+        return run
 
 
 class FontOptions(object):
@@ -421,6 +1341,8 @@ class FontOptions(object):
         return cairo.cairo_font_options_hash(self._pointer)
 
     def __eq__(self, other):
+        if not isinstance(other, FontOptions):
+            return NotImplemented
         return cairo.cairo_font_options_equal(self._pointer, other._pointer)
 
     def __ne__(self, other):
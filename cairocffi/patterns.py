@@ -10,12 +10,15 @@
 
 """
 
-from . import ffi, cairo, _check_status, constants
+from . import ffi, cairo, _check_status, _callback_errors, constants
 from .matrix import Matrix
-from .surfaces import Surface
+from .surfaces import Surface, KeepAlive
 from .compat import xrange
 
 
+PATTERN_CALLBACKS_KEY = ffi.new('cairo_user_data_key_t *')
+
+
 class Pattern(object):
     """The base class for all pattern types.
 
@@ -364,9 +367,115 @@ class RadialGradient(Gradient):
         return tuple(circles)
 
 
+class RasterSourcePattern(Pattern):
+    """Create a new pattern whose pixels are supplied on demand
+    by user callbacks, rather than held in a surface.
+
+    Each time the pattern is used as a source,
+    cairo calls :obj:`acquire` for the region it needs,
+    and :obj:`release` once it is done with that region.
+    Pixels are only decoded when something is actually drawn,
+    but the region may be the whole extents of the pattern
+    even if only a small part of it is visible.
+    To only decode the visible parts of a very large image,
+    split it into tiles with one smaller pattern each.
+
+    :param content: The :ref:`CONTENT` string of the pattern.
+    :param width: Width of the pattern, in pixels.
+    :param height: Height of the pattern, in pixels.
+    :param acquire:
+        A callable, or :obj:`None`. See :meth:`set_acquire`.
+    :param release:
+        A callable, or :obj:`None`. See :meth:`set_acquire`.
+    :type width: int
+    :type height: int
+
+    *New in cairo 1.12.*
+
+    """
+    def __init__(self, content, width, height, acquire=None, release=None):
+        Pattern.__init__(self, cairo.cairo_pattern_create_raster_source(
+            ffi.NULL, content, width, height))
+        if acquire is not None:
+            self.set_acquire(acquire, release)
+
+    def set_acquire(self, acquire, release=None):
+        """Set the callbacks used to get pixel data for this pattern.
+
+        :obj:`acquire` is called as ``acquire(target, extents)``,
+        where :obj:`target` is the :class:`Surface` being drawn to
+        and :obj:`extents` is a ``(x, y, width, height)`` tuple of integers,
+        the region of the pattern needed for the operation,
+        which may be the whole pattern.
+        It must return a :class:`Surface`,
+        typically an :class:`ImageSurface` covering the requested region.
+        The pixel at ``(0, 0)`` in device space of that surface
+        is at ``(0, 0)`` in pattern space,
+        so a surface that only covers :obj:`extents`
+        should have its :meth:`~Surface.set_device_offset`
+        set to ``(-x, -y)``::
+
+            def acquire(target, extents):
+                x, y, width, height = extents
+                tile = ImageSurface(FORMAT_ARGB32, width, height)
+                tile.set_device_offset(-x, -y)
+                draw_tile(tile, x, y)
+                return tile
+
+        If :obj:`acquire` raises an exception,
+        the drawing operation fails and re-raises it.
+        This only works with image targets:
+        with vector targets such as :class:`PDFSurface`,
+        cairo does not handle failures and :obj:`acquire` must not raise.
+
+        :obj:`release`, if not :obj:`None`,
+        is called as ``release(surface)`` with the surface returned by
+        :obj:`acquire` once cairo is done with it.
+        cairocffi keeps a reference to the surface until then,
+        so :obj:`release` is only needed to recycle resources.
+
+        """
+        @ffi.callback('cairo_raster_source_acquire_func_t', error=ffi.NULL)
+        def acquire_func(_pattern, _callback_data, target, extents):
+            # Do not re-raise an exception cairo did not report.
+            _callback_errors.exception = None
+            try:
+                target = (Surface._from_pointer(target, incref=True)
+                          if target != ffi.NULL else None)
+                surface = acquire(target, (
+                    extents.x, extents.y, extents.width, extents.height))
+                # Released in release_func.
+                cairo.cairo_surface_reference(surface._pointer)
+                return surface._pointer
+            except Exception as exception:
+                # cairo only sees a NULL surface and fails with an error
+                # status, which _check_status replaces with this exception.
+                _callback_errors.exception = exception
+                return ffi.NULL
+
+        @ffi.callback('cairo_raster_source_release_func_t')
+        def release_func(_pattern, _callback_data, surface):
+            try:
+                if release is not None:
+                    release(Surface._from_pointer(surface, incref=True))
+            finally:
+                cairo.cairo_surface_destroy(surface)
+
+        cairo.cairo_raster_source_pattern_set_acquire(
+            self._pointer, acquire_func, release_func)
+        self._check_status()
+        # The callbacks must live as long as the cairo pattern,
+        # which can outlive this Python object.
+        keep_alive = KeepAlive(acquire_func, release_func)
+        _check_status(cairo.cairo_pattern_set_user_data(
+            self._pointer, PATTERN_CALLBACKS_KEY, *keep_alive.closure))
+        keep_alive.save()
+
+
 PATTERN_TYPE_TO_CLASS = {
     constants.PATTERN_TYPE_SOLID: SolidPattern,
     constants.PATTERN_TYPE_SURFACE: SurfacePattern,
     constants.PATTERN_TYPE_LINEAR: LinearGradient,
     constants.PATTERN_TYPE_RADIAL: RadialGradient,
+    constants.PATTERN_TYPE_RASTER_SOURCE: RasterSourcePattern,
 }
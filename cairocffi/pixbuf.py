@@ -10,13 +10,17 @@
 
 """
 
+import re
 import sys
+import hashlib
+import threading
+from timeit import default_timer
 from io import BytesIO
 from functools import partial
-from array import array
 
-from . import dlopen, ImageSurface, Context, constants
+from . import dlopen, cairo, ImageSurface, Context, constants, _check_status
 from .compat import xrange
+from .caching import LRUCache
 
 try:
     from ._ffi_pixbuf import ffi
@@ -24,17 +28,71 @@ except ImportError:
     # PyPy < 2.6 compatibility
     from .ffi_build import ffi_pixbuf as ffi
 
-__all__ = ['decode_to_image_surface']
+__all__ = ['decode_to_image_surface', 'decode_file', 'decode_many']
 
-gdk_pixbuf = dlopen(ffi, 'gdk_pixbuf-2.0', 'gdk_pixbuf-2.0-0')
-gobject = dlopen(ffi, 'gobject-2.0', 'gobject-2.0-0')
-glib = dlopen(ffi, 'glib-2.0', 'glib-2.0-0')
-try:
-    gdk = dlopen(ffi, 'gdk-3', 'gdk-x11-2.0', 'gdk-win32-2.0-0')
-except OSError:
-    gdk = None
+#: Callables called as ``hook(seconds)``
+#: after :func:`load_libraries` actually loads the libraries,
+#: for example to report startup costs.
+load_hooks = []
+
+_LIBRARY_NAMES = ('gdk_pixbuf', 'gobject', 'glib', 'gdk')
+_libraries_lock = threading.Lock()
+_libraries_loaded = False
+
+
+def load_libraries():
+    """Load GDK-PixBuf, GObject, GLib and (if available) GDK.
+
+    This is done on the first decoded image rather than on import,
+    since finding GDK alone loads large parts of GTK+ and X11
+    (except on Python < 3.7, where module attributes can not be lazy).
+    Call this explicitly to pay that cost at a time of your choosing.
+    Calling again does nothing.
+
+    :returns:
+        The time spent loading the libraries in seconds,
+        or :obj:`None` if they were already loaded.
 
-gobject.g_type_init()
+    """
+    global _libraries_loaded, gdk_pixbuf, gobject, glib, gdk
+    global _gdk_surface_from_pixbuf
+    if _libraries_loaded:
+        return None
+    with _libraries_lock:
+        if _libraries_loaded:
+            return None
+        start = default_timer()
+        gdk_pixbuf = dlopen(ffi, 'gdk_pixbuf-2.0', 'gdk_pixbuf-2.0-0')
+        gobject = dlopen(ffi, 'gobject-2.0', 'gobject-2.0-0')
+        glib = dlopen(ffi, 'glib-2.0', 'glib-2.0-0')
+        try:
+            gdk = dlopen(ffi, 'gdk-3', 'gdk-x11-2.0', 'gdk-win32-2.0-0')
+        except OSError:
+            gdk = None
+        # New in GDK 3.10
+        _gdk_surface_from_pixbuf = getattr(
+            gdk, 'gdk_cairo_surface_create_from_pixbuf', None)
+
+        gobject.g_type_init()
+        _libraries_loaded = True
+        seconds = default_timer() - start
+    for hook in load_hooks:
+        hook(seconds)
+    return seconds
+
+
+def __getattr__(name):
+    # Load libraries when accessed as module attributes, on Python 3.7+.
+    if name in _LIBRARY_NAMES:
+        load_libraries()
+        return globals()[name]
+    raise AttributeError(
+        'module %r has no attribute %r' % (__name__, name))
+
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    # No module-level __getattr__, load the libraries now.
+    load_libraries()
 
 
 class ImageLoadingError(ValueError):
@@ -73,11 +131,17 @@ class Pixbuf(object):
         return partial(function, self._pointer)
 
 
-def decode_to_pixbuf(image_data):
+def decode_to_pixbuf(image_data, target_size=None, max_size=None):
     """Decode an image from memory with GDK-PixBuf.
     The file format is detected automatically.
 
     :param image_data: A byte string
+    :param target_size:
+        A ``(width, height)`` tuple to decode the image at that size,
+        or :obj:`None` to keep its original size.
+    :param max_size:
+        A ``(width, height)`` tuple.
+        Larger images are scaled down to fit, keeping their aspect ratio.
     :returns:
         A tuple of a new :class:`PixBuf` object
         and the name of the detected image format.
@@ -86,11 +150,117 @@ def decode_to_pixbuf(image_data):
         or in an unsupported format.
 
     """
-    loader = ffi.gc(
-        gdk_pixbuf.gdk_pixbuf_loader_new(), gobject.g_object_unref)
+    # The size callback must stay alive until the loader is closed.
+    loader, size_callback = _create_loader(target_size, max_size)
     error = ffi.new('GError **')
     handle_g_error(error, gdk_pixbuf.gdk_pixbuf_loader_write(
         loader, ffi.new('guchar[]', image_data), len(image_data), error))
+    return _close_loader(loader, error)
+
+
+def decode_file_to_pixbuf(file_obj, chunk_size=65536, target_size=None,
+                          max_size=None):
+    """Decode an image from a file with GDK-PixBuf.
+    The file format is detected automatically.
+
+    The file is read and decoded incrementally,
+    so that the whole encoded image is never kept in memory.
+
+    :param file_obj:
+        A filename or a binary mode file-like object
+        with a :meth:`~file.read` method.
+    :param chunk_size: The number of bytes read at a time.
+    :param target_size:
+        A ``(width, height)`` tuple to decode the image at that size,
+        or :obj:`None` to keep its original size.
+    :param max_size:
+        A ``(width, height)`` tuple.
+        Larger images are scaled down to fit, keeping their aspect ratio.
+    :returns:
+        A tuple of a new :class:`PixBuf` object
+        and the name of the detected image format.
+    :raises:
+        :exc:`ImageLoadingError` if the image data is invalid
+        or in an unsupported format.
+
+    """
+    if not hasattr(file_obj, 'read'):
+        with open(file_obj, 'rb') as file_obj:
+            return decode_file_to_pixbuf(
+                file_obj, chunk_size, target_size, max_size)
+
+    loader, size_callback = _create_loader(target_size, max_size)
+    error = ffi.new('GError **')
+    # The same buffer is reused for every chunk, and passed without a copy.
+    chunk = bytearray(chunk_size)
+    chunk_pointer = ffi.cast('guchar *', ffi.from_buffer(chunk))
+    readinto = getattr(file_obj, 'readinto', None)
+    while True:
+        if readinto is not None:
+            length = readinto(chunk)
+        else:
+            data = file_obj.read(chunk_size)
+            length = len(data)
+            chunk[:length] = data
+        if not length:
+            break
+        handle_g_error(error, gdk_pixbuf.gdk_pixbuf_loader_write(
+            loader, chunk_pointer, length, error))
+    return _close_loader(loader, error)
+
+
+def _create_loader(target_size, max_size):
+    """Return a new loader,
+    and the signal handler to keep alive while it is used.
+
+    """
+    load_libraries()
+    loader = ffi.gc(
+        gdk_pixbuf.gdk_pixbuf_loader_new(), gobject.g_object_unref)
+    if target_size is None and max_size is None:
+        return loader, None
+
+    # Loaders that support it (like JPEG) then decode at a reduced size,
+    # others scale the decoded image.
+    @ffi.callback('void(GdkPixbufLoader *, gint, gint, gpointer)')
+    def size_prepared(loader, width, height, _data):
+        new_width, new_height = scaled_size(
+            width, height, target_size, max_size)
+        if (new_width, new_height) != (width, height):
+            gdk_pixbuf.gdk_pixbuf_loader_set_size(
+                loader, new_width, new_height)
+
+    gobject.g_signal_connect_data(
+        loader, b'size-prepared', ffi.cast('GCallback', size_prepared),
+        ffi.NULL, ffi.NULL, 0)
+    return loader, size_prepared
+
+
+def scaled_size(width, height, target_size=None, max_size=None):
+    """Return the size at which an image is decoded.
+
+    :param width: The original width of the image, in pixels.
+    :param height: The original height of the image, in pixels.
+    :param target_size:
+        A ``(width, height)`` tuple, or :obj:`None`.
+    :param max_size:
+        A ``(width, height)`` tuple, or :obj:`None`.
+    :returns: A ``(width, height)`` tuple.
+
+    """
+    if target_size is not None:
+        width, height = target_size
+    if max_size is not None:
+        max_width, max_height = max_size
+        ratio = min(float(max_width) / width, float(max_height) / height)
+        if ratio < 1:
+            width = max(1, int(round(width * ratio)))
+            height = max(1, int(round(height * ratio)))
+    return width, height
+
+
+def _close_loader(loader, error):
+    """Finish decoding and return ``(pixbuf, format_name)``."""
     handle_g_error(error, gdk_pixbuf.gdk_pixbuf_loader_close(loader, error))
 
     format_ = gdk_pixbuf.gdk_pixbuf_loader_get_format(loader)
@@ -105,11 +275,17 @@ def decode_to_pixbuf(image_data):
     return Pixbuf(pixbuf), format_name
 
 
-def decode_to_image_surface(image_data):
+def decode_to_image_surface(image_data, target_size=None, max_size=None):
     """Decode an image from memory into a cairo surface.
     The file format is detected automatically.
 
     :param image_data: A byte string
+    :param target_size:
+        A ``(width, height)`` tuple to decode the image at that size,
+        or :obj:`None` to keep its original size.
+    :param max_size:
+        A ``(width, height)`` tuple.
+        Larger images are scaled down to fit, keeping their aspect ratio.
     :returns:
         A tuple of a new :class:`~cairocffi.ImageSurface` object
         and the name of the detected image format.
@@ -118,12 +294,174 @@ def decode_to_image_surface(image_data):
         or in an unsupported format.
 
     """
-    pixbuf, format_name = decode_to_pixbuf(image_data)
-    surface = (
-        pixbuf_to_cairo_gdk(pixbuf) if gdk is not None
-        else pixbuf_to_cairo_slices(pixbuf) if not pixbuf.get_has_alpha()
-        else pixbuf_to_cairo_png(pixbuf))
-    return surface, format_name
+    cache = _decoded_cache
+    if cache is None:
+        pixbuf, format_name = decode_to_pixbuf(
+            image_data, target_size, max_size)
+        return pixbuf_to_image_surface(pixbuf), format_name
+
+    # Sizes may be given as lists, which are not hashable.
+    key = (len(image_data), hashlib.sha1(image_data).digest(),
+           target_size and tuple(target_size), max_size and tuple(max_size))
+    with _decoded_cache_lock:
+        result = cache.get(key)
+    if result is None:
+        pixbuf, format_name = decode_to_pixbuf(
+            image_data, target_size, max_size)
+        result = pixbuf_to_image_surface(pixbuf), format_name
+        with _decoded_cache_lock:
+            cache[key] = result
+    return result
+
+
+def decode_many(blobs, max_workers=None, target_size=None, max_size=None):
+    """Decode many images from memory into cairo surfaces, in parallel.
+
+    Images are decoded by :func:`decode_to_image_surface` on a thread pool.
+    GDK-PixBuf does most of the work without holding the GIL,
+    so this uses multiple cores.
+
+    :param blobs: An iterable of byte strings.
+    :param max_workers:
+        The maximum number of threads.
+        Defaults to the number of CPUs.
+    :type max_workers: int
+    :param target_size: See :func:`decode_to_image_surface`.
+    :param max_size: See :func:`decode_to_image_surface`.
+    :returns:
+        A list with an item for each image, in the same order as :obj:`blobs`:
+        either a ``(surface, format_name)`` tuple like
+        :func:`decode_to_image_surface` returns,
+        or an :exc:`ImageLoadingError` instance if that image is invalid.
+
+    """
+    def decode(image_data):
+        try:
+            return decode_to_image_surface(image_data, target_size, max_size)
+        except ImageLoadingError as exception:
+            return exception
+
+    # Not imported with the module: multiprocessing is slow to import.
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+
+    blobs = list(blobs)
+    if max_workers is None:
+        try:
+            max_workers = multiprocessing.cpu_count()
+        except NotImplementedError:  # pragma: no cover
+            max_workers = 1
+    max_workers = min(max_workers, len(blobs))
+    if max_workers <= 1:
+        return [decode(image_data) for image_data in blobs]
+    pool = ThreadPool(max_workers)
+    try:
+        return pool.map(decode, blobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+_decoded_cache = None
+_decoded_cache_lock = threading.Lock()
+
+
+def _decoded_weight(result):
+    surface, _format_name = result
+    return surface.get_stride() * surface.get_height()
+
+
+def enable_cache(max_bytes=64 * 1024 * 1024):
+    """Start memoizing the results of :func:`decode_to_image_surface`
+    for the whole process.
+
+    Results are keyed by a hash of the encoded image data,
+    so that the same image is decoded once
+    even when it comes from different places.
+    The same :class:`~cairocffi.ImageSurface` object is returned every time:
+    it should not be drawn on.
+    Enabling again replaces the cache with an empty one.
+
+    :param max_bytes:
+        The maximum total size of cached pixel data
+        (``stride * height`` for each surface),
+        the least recently used images being discarded first.
+    :type max_bytes: int
+
+    """
+    global _decoded_cache
+    with _decoded_cache_lock:
+        _decoded_cache = LRUCache(
+            maxsize=None, maxweight=max_bytes, weigh=_decoded_weight)
+
+
+def disable_cache():
+    """Stop memoizing decoded images and free the cache.
+    See :func:`enable_cache`.
+
+    """
+    global _decoded_cache
+    with _decoded_cache_lock:
+        _decoded_cache = None
+
+
+def cache_info():
+    """Return statistics about the cache of decoded images, if enabled.
+
+    :returns:
+        A ``(hits, misses, evictions, size, maxsize)`` named tuple,
+        or :obj:`None` if :func:`enable_cache` was not called.
+        :obj:`size` counts images, not bytes.
+
+    """
+    cache = _decoded_cache
+    if cache is not None:
+        with _decoded_cache_lock:
+            return cache.info()
+
+
+def decode_file(file_obj, chunk_size=65536, target_size=None,
+                max_size=None):
+    """Decode an image from a file into a cairo surface.
+    The file format is detected automatically.
+
+    Unlike :func:`decode_to_image_surface`,
+    the file is read and decoded incrementally:
+    peak memory use is one chunk plus the decoded image.
+
+    :param file_obj:
+        A filename or a binary mode file-like object
+        with a :meth:`~file.read` method.
+    :param chunk_size: The number of bytes read at a time.
+    :param target_size:
+        A ``(width, height)`` tuple to decode the image at that size,
+        or :obj:`None` to keep its original size.
+    :param max_size:
+        A ``(width, height)`` tuple.
+        Larger images are scaled down to fit, keeping their aspect ratio.
+    :returns:
+        A tuple of a new :class:`~cairocffi.ImageSurface` object
+        and the name of the detected image format.
+    :raises:
+        :exc:`ImageLoadingError` if the image data is invalid
+        or in an unsupported format.
+
+    """
+    pixbuf, format_name = decode_file_to_pixbuf(
+        file_obj, chunk_size, target_size, max_size)
+    return pixbuf_to_image_surface(pixbuf), format_name
+
+
+def pixbuf_to_image_surface(pixbuf):
+    """Convert from PixBuf to ImageSurface, with the fastest available method.
+
+    """
+    if gdk is not None:
+        return pixbuf_to_cairo_gdk(pixbuf)
+    elif not pixbuf.get_has_alpha():
+        return pixbuf_to_cairo_slices(pixbuf)
+    else:
+        return pixbuf_to_cairo_premultiplied(pixbuf)
 
 
 def pixbuf_to_cairo_gdk(pixbuf):
@@ -132,16 +470,37 @@ def pixbuf_to_cairo_gdk(pixbuf):
     This method is fastest but GDK is not always available.
 
     """
-    dummy_context = Context(ImageSurface(constants.FORMAT_ARGB32, 1, 1))
-    gdk.gdk_cairo_set_source_pixbuf(
-        dummy_context._pointer, pixbuf._pointer, 0, 0)
-    return dummy_context.get_source().get_surface()
+    if _gdk_surface_from_pixbuf is not None:
+        return ImageSurface._from_pointer(
+            _gdk_surface_from_pixbuf(pixbuf._pointer, 1, ffi.NULL),
+            incref=False)
+
+    # Older GDK versions can only set the source of a context:
+    # reuse a scratch context for each thread.
+    context = getattr(_scratch, 'context', None)
+    if context is None:
+        context = _scratch.context = Context(
+            ImageSurface(constants.FORMAT_ARGB32, 1, 1))
+    gdk.gdk_cairo_set_source_pixbuf(context._pointer, pixbuf._pointer, 0, 0)
+    surface = ffi.new('cairo_surface_t **')
+    _check_status(cairo.cairo_pattern_get_surface(
+        cairo.cairo_get_source(context._pointer), surface))
+    surface = ImageSurface._from_pointer(surface[0], incref=True)
+    # Do not keep the image alive through the scratch context.
+    cairo.cairo_set_source_rgba(context._pointer, 0, 0, 0, 0)
+    return surface
+
+
+_scratch = threading.local()
 
 
 def pixbuf_to_cairo_slices(pixbuf):
     """Convert from PixBuf to ImageSurface, using slice-based byte swapping.
 
-    This method is 2~5x slower than GDK but does not support an alpha channel.
+    Pixels are written directly into the data of the new surface,
+    with NumPy if it is installed
+    or with extended slices over the whole image otherwise.
+    This method does not support an alpha channel.
     (cairo uses pre-multiplied alpha, but not Pixbuf.)
 
     """
@@ -152,40 +511,173 @@ def pixbuf_to_cairo_slices(pixbuf):
     height = pixbuf.get_height()
     rowstride = pixbuf.get_rowstride()
     pixels = ffi.buffer(pixbuf.get_pixels(), pixbuf.get_byte_length())
-    # TODO: remove this when cffi buffers support slicing with a stride.
-    pixels = pixels[:]
-
-    # Convert GdkPixbuf’s big-endian RGBA to cairo’s native-endian ARGB
-    cairo_stride = ImageSurface.format_stride_for_width(
-        constants.FORMAT_RGB24, width)
-    data = bytearray(cairo_stride * height)
-    big_endian = sys.byteorder == 'big'
-    pixbuf_row_length = width * 3  # stride == row_length + padding
-    cairo_row_length = width * 4  # stride == row_length + padding
-    alpha = b'\xff' * width  # opaque
-    for y in xrange(height):
-        offset = rowstride * y
-        end = offset + pixbuf_row_length
-        red = pixels[offset:end:3]
-        green = pixels[offset + 1:end:3]
-        blue = pixels[offset + 2:end:3]
-
-        offset = cairo_stride * y
-        end = offset + cairo_row_length
-        if big_endian:  # pragma: no cover
-            data[offset:end:4] = alpha
-            data[offset + 1:end:4] = red
-            data[offset + 2:end:4] = green
-            data[offset + 3:end:4] = blue
-        else:
-            data[offset + 3:end:4] = alpha
-            data[offset + 2:end:4] = red
-            data[offset + 1:end:4] = green
-            data[offset:end:4] = blue
-
-    data = array('B', data)
-    return ImageSurface(constants.FORMAT_RGB24,
-                        width, height, data, cairo_stride)
+    surface = ImageSurface(constants.FORMAT_RGB24, width, height)
+    try:
+        import numpy
+    except ImportError:
+        _rgb_to_xrgb_slices(pixels, width, height, rowstride,
+                            surface.get_data(), surface.get_stride())
+    else:
+        _rgb_to_xrgb_numpy(numpy, pixels, width, height, rowstride,
+                           surface.get_data(), surface.get_stride())
+    surface.mark_dirty()
+    return surface
+
+
+if sys.byteorder == 'big':  # pragma: no cover
+    _XRGB_OFFSETS = 1, 2, 3, 0  # red, green, blue, unused
+else:
+    _XRGB_OFFSETS = 2, 1, 0, 3
+
+
+def _rgb_to_xrgb_numpy(numpy, pixels, width, height, rowstride,
+                       data, stride):
+    """Convert GdkPixbuf’s big-endian RGB pixels to cairo’s native-endian xRGB
+    in the :obj:`data` buffer of an :obj:`FORMAT_RGB24` image surface.
+
+    """
+    rgb = numpy.lib.stride_tricks.as_strided(
+        numpy.frombuffer(pixels, numpy.uint8),
+        (height, width, 3), (rowstride, 3, 1))
+    xrgb = numpy.frombuffer(data, numpy.uint8).reshape(
+        height, stride // 4, 4)[:, :width]
+    red, green, blue, unused = _XRGB_OFFSETS
+    xrgb[..., red] = rgb[..., 0]
+    xrgb[..., green] = rgb[..., 1]
+    xrgb[..., blue] = rgb[..., 2]
+    xrgb[..., unused] = 0xff
+
+
+def _rgb_to_xrgb_slices(pixels, width, height, rowstride, data, stride):
+    """Like :func:`_rgb_to_xrgb_numpy`, without NumPy.
+
+    Without padding, the whole image is converted at once
+    with four extended slice assignments.
+
+    """
+    if sys.version_info >= (3,):
+        source = memoryview(pixels)
+        target = memoryview(data)
+    else:  # pragma: no cover
+        # Python 2 memoryviews do not support slicing with a step.
+        source = pixels[:]
+        target = bytearray(len(data))
+    if rowstride == width * 3 and stride == width * 4:
+        chunks = [(0, 0)]
+        length = width * height
+    else:
+        chunks = ((rowstride * y, stride * y) for y in xrange(height))
+        length = width
+    opaque = b'\xff' * length
+    red, green, blue, unused = _XRGB_OFFSETS
+    for source_offset, offset in chunks:
+        source_end = source_offset + length * 3
+        end = offset + length * 4
+        target[offset + red:end:4] = source[source_offset:source_end:3]
+        target[offset + green:end:4] = source[source_offset + 1:source_end:3]
+        target[offset + blue:end:4] = source[source_offset + 2:source_end:3]
+        target[offset + unused:end:4] = opaque
+    if sys.version_info < (3,):  # pragma: no cover
+        data[:] = bytes(target)
+
+
+def pixbuf_to_cairo_premultiplied(pixbuf):
+    """Convert from PixBuf with an alpha channel to ImageSurface,
+    pre-multiplying colors by alpha directly.
+
+    This uses NumPy if it is installed.
+    Otherwise, bytes are swapped with slices for the whole image
+    and only partially transparent pixels are converted one by one,
+    which is still much faster than going through the PNG format.
+    Colors are rounded the same way as when cairo loads a PNG image.
+
+    """
+    assert pixbuf.get_colorspace() == gdk_pixbuf.GDK_COLORSPACE_RGB
+    assert pixbuf.get_n_channels() == 4
+    assert pixbuf.get_bits_per_sample() == 8
+    width = pixbuf.get_width()
+    height = pixbuf.get_height()
+    rowstride = pixbuf.get_rowstride()
+    pixels = ffi.buffer(pixbuf.get_pixels(), pixbuf.get_byte_length())
+    try:
+        import numpy
+    except ImportError:
+        data = _rgba_to_argb32_bytes(pixels, width, height, rowstride)
+        return ImageSurface(constants.FORMAT_ARGB32, width, height, data)
+    surface = ImageSurface(constants.FORMAT_ARGB32, width, height)
+    _rgba_to_argb32_numpy(
+        numpy, pixels, width, height, rowstride, surface.get_data())
+    surface.mark_dirty()
+    return surface
+
+
+def _multiply_alpha(alpha, color):
+    """Pre-multiply with the same rounding as cairo’s PNG loader."""
+    temp = alpha * color + 0x80
+    return ((temp >> 8) + temp) >> 8
+
+
+def _rgba_to_argb32_numpy(numpy, pixels, width, height, rowstride, data):
+    """Convert big-endian RGBA pixels to pre-multiplied native-endian ARGB
+    in the :obj:`data` buffer of an :obj:`FORMAT_ARGB32` image surface.
+
+    """
+    rgba = numpy.lib.stride_tricks.as_strided(
+        numpy.frombuffer(pixels, numpy.uint8),
+        (height, width, 4), (rowstride, 4, 1)).astype(numpy.uint32)
+    alpha = rgba[..., 3]
+    colors = rgba[..., :3] * alpha[..., None] + 0x80
+    colors = ((colors >> 8) + colors) >> 8
+    argb = numpy.frombuffer(data, numpy.uint32).reshape(height, width)
+    argb[...] = (
+        (alpha << 24) | (colors[..., 0] << 16) |
+        (colors[..., 1] << 8) | colors[..., 2])
+
+
+def _rgba_to_argb32_bytes(pixels, width, height, rowstride):
+    """Like :func:`_rgba_to_argb32_numpy`, without NumPy.
+
+    :returns: A new :class:`bytearray` with cairo’s stride.
+
+    """
+    row_length = width * 4  # Also cairo’s stride for ARGB32
+    data = bytearray(row_length * height)
+    if sys.byteorder == 'big':  # pragma: no cover
+        alpha_offset, red, green, blue = 0, 1, 2, 3
+    else:
+        alpha_offset, red, green, blue = 3, 2, 1, 0
+    if rowstride == row_length:  # No padding: the whole image at once.
+        chunks = [(0, pixels[:len(data)])]
+    else:
+        chunks = (
+            (row_length * y, pixels[rowstride * y:rowstride * y + row_length])
+            for y in xrange(height))
+    for offset, chunk in chunks:
+        end = offset + len(chunk)
+        data[offset + red:end:4] = chunk[0::4]
+        data[offset + green:end:4] = chunk[1::4]
+        data[offset + blue:end:4] = chunk[2::4]
+        data[offset + alpha_offset:end:4] = chunk[3::4]
+
+    alpha = bytes(data[alpha_offset::4])
+    # Fully transparent pixels become zeros.
+    for match in re.finditer(b'\x00+', alpha):
+        start, end = match.span()
+        data[start * 4:end * 4] = bytearray((end - start) * 4)
+    # Partially transparent pixels are multiplied one by one.
+    color_offset = 1 if alpha_offset == 0 else 0
+    tables = {}
+    alpha_values = bytearray(alpha)
+    for match in re.finditer(b'[\x01-\xfe]', alpha):
+        i = match.start()
+        value = alpha_values[i]
+        table = tables.get(value)
+        if table is None:
+            table = tables[value] = bytes(bytearray(
+                _multiply_alpha(value, color) for color in xrange(256)))
+        start = i * 4 + color_offset
+        data[start:start + 3] = data[start:start + 3].translate(table)
+    return data
 
 
 def pixbuf_to_cairo_png(pixbuf):
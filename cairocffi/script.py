@@ -0,0 +1,295 @@
+# coding: utf-8
+"""
+    cairocffi.script
+    ~~~~~~~~~~~~~~~~
+
+    Recording drawing operations as cairo-script traces, and replaying them.
+
+    :copyright: Copyright 2013 by Simon Sapin
+    :license: BSD, see LICENSE for details.
+
+"""
+
+import sys
+
+from . import dlopen, cairo, constants, _check_status
+from .surfaces import (Surface, SURFACE_TYPE_TO_CLASS, _make_write_func,
+                       _encode_filename)
+from .fonts import KeepAlive
+from .context import Context
+
+try:
+    from ._ffi_script import ffi
+except ImportError:
+    # PyPy < 2.6 compatibility
+    from .ffi_build import ffi_script as ffi
+
+__all__ = ['ScriptRecorder', 'ScriptSurface', 'ScriptInterpreter']
+
+try:
+    interpreter = dlopen(
+        ffi, 'cairo-script-interpreter', 'cairo-script-interpreter-2')
+except OSError:
+    interpreter = None
+
+SCRIPT_TARGET_KEY = ffi.new('cairo_user_data_key_t *')
+
+
+class ScriptRecorder(object):
+    """A cairo-script device, writing a trace of every drawing operation
+    done on the :class:`ScriptSurface` objects created for it.
+
+    Traces are text (or compressed binary, see :meth:`set_mode`) programs
+    that :class:`ScriptInterpreter` can replay later,
+    without the Python code that produced them.
+    This is useful to benchmark or debug rasterization
+    separately from the application doing the drawing.
+
+    :param target:
+        A filename or
+        a binary mode file-like object with a :meth:`~file.write` method.
+
+    *New in cairo 1.12.*
+
+    """
+    def __init__(self, target):
+        if hasattr(target, 'write'):
+            write_func = _make_write_func(target)
+            pointer = cairo.cairo_script_create_for_stream(
+                write_func, ffi.NULL)
+        else:
+            write_func = None
+            pointer = cairo.cairo_script_create(_encode_filename(target))
+        self._pointer = ffi.gc(pointer, cairo.cairo_device_destroy)
+        self._check_status()
+        if write_func is not None:
+            keep_alive = KeepAlive(write_func)
+            _check_status(cairo.cairo_device_set_user_data(
+                self._pointer, SCRIPT_TARGET_KEY, *keep_alive.closure))
+            keep_alive.save()
+
+    def _check_status(self):
+        _check_status(cairo.cairo_device_status(self._pointer))
+
+    def set_mode(self, mode):
+        """Change the output mode of the trace.
+
+        :param mode: A :ref:`SCRIPT_MODE` string.
+
+        """
+        cairo.cairo_script_set_mode(self._pointer, mode)
+        self._check_status()
+
+    def get_mode(self):
+        """Return the current output mode of the trace.
+
+        :returns: A :ref:`SCRIPT_MODE` string.
+
+        """
+        return cairo.cairo_script_get_mode(self._pointer)
+
+    def write_comment(self, comment):
+        """Write a comment into the trace.
+
+        :param comment: A Unicode or UTF-8 byte string.
+
+        """
+        if not isinstance(comment, bytes):
+            comment = comment.encode('utf8')
+        cairo.cairo_script_write_comment(
+            self._pointer, ffi.new('char[]', comment), len(comment))
+        self._check_status()
+
+    def from_recording_surface(self, recording_surface):
+        """Convert the operations recorded by a :class:`RecordingSurface`
+        into a trace.
+
+        :param recording_surface: A :class:`RecordingSurface` object.
+
+        """
+        _check_status(cairo.cairo_script_from_recording_surface(
+            self._pointer, recording_surface._pointer))
+
+    def flush(self):
+        """Write any pending part of the trace to the target."""
+        cairo.cairo_device_flush(self._pointer)
+        self._check_status()
+
+    def finish(self):
+        """Write the end of the trace and release the target.
+
+        Surfaces using this recorder can not be drawn to afterwards.
+
+        """
+        cairo.cairo_device_finish(self._pointer)
+        self._check_status()
+
+
+class ScriptSurface(Surface):
+    """A surface that records drawing operations as cairo-script
+    on a :class:`ScriptRecorder`.
+
+    :param recorder: A :class:`ScriptRecorder` object.
+    :param content: The :ref:`CONTENT` string of the recording surface.
+    :param width: The width of the surface, in pixels.
+    :param height: The height of the surface, in pixels.
+    :type width: float
+    :type height: float
+
+    *New in cairo 1.12.*
+
+    """
+    def __init__(self, recorder, content, width, height):
+        Surface.__init__(self, cairo.cairo_script_surface_create(
+            recorder._pointer, content, width, height))
+
+    @classmethod
+    def create_for_target(cls, recorder, target):
+        """Create a proxy surface that draws on :obj:`target`
+        while also recording every operation on :obj:`recorder`.
+
+        This allows capturing the traces of an existing drawing code path
+        without changing its output.
+
+        :param recorder: A :class:`ScriptRecorder` object.
+        :param target: The :class:`Surface` to draw on.
+        :returns: A new :class:`ScriptSurface` object.
+
+        """
+        self = object.__new__(cls)
+        Surface.__init__(self, cairo.cairo_script_surface_create_for_target(
+            recorder._pointer, target._pointer))
+        return self
+
+
+class ScriptInterpreter(object):
+    """Replay cairo-script traces,
+    such as those written by :class:`ScriptRecorder`.
+
+    The optional callbacks let the caller choose where the trace is replayed.
+    Exceptions they raise stop the replay
+    and are re-raised by :meth:`run`, :meth:`feed` or :meth:`finish`.
+
+    :param surface_create:
+        Called as ``surface_create(content, width, height, uid)``
+        for each surface in the trace.
+        Must return a new :class:`Surface` object.
+    :param context_create:
+        Called as ``context_create(surface)`` for each context in the trace,
+        with a :class:`Surface` object.
+        Must return a new :class:`Context` object.
+    :param show_page:
+        Called as ``show_page(context)`` on each page emitted by the trace.
+    :param copy_page:
+        Called as ``copy_page(context)`` on each page copied by the trace.
+    :raises:
+        :exc:`OSError` if the ``cairo-script-interpreter`` library
+        is not available.
+
+    """
+    def __init__(self, surface_create=None, context_create=None,
+                 show_page=None, copy_page=None):
+        if interpreter is None:
+            raise OSError('The cairo-script-interpreter library is missing.')
+        self._pointer = ffi.gc(
+            interpreter.cairo_script_interpreter_create(),
+            interpreter.cairo_script_interpreter_destroy)
+        self._errors = errors = []
+        hooks = ffi.new('cairo_script_interpreter_hooks_t *')
+        # Reading a function pointer back from the struct gives a cdata
+        # that does not own the callback: keep the callbacks themselves.
+        self._callbacks = callbacks = []
+
+        if surface_create is not None:
+            @ffi.callback('csi_surface_create_func_t', error=ffi.NULL)
+            def surface_create_func(_closure, content, width, height, uid):
+                try:
+                    surface = surface_create(content, width, height, uid)
+                    return cairo.cairo_surface_reference(surface._pointer)
+                except Exception:
+                    errors.append(sys.exc_info())
+                    # An error surface makes the interpreter stop.
+                    return cairo.cairo_image_surface_create(
+                        constants.FORMAT_INVALID, 0, 0)
+            hooks.surface_create = surface_create_func
+            callbacks.append(surface_create_func)
+
+        if context_create is not None:
+            @ffi.callback('csi_context_create_func_t', error=ffi.NULL)
+            def context_create_func(_closure, surface):
+                try:
+                    context = context_create(
+                        Surface._from_pointer(surface, incref=True))
+                    return cairo.cairo_reference(context._pointer)
+                except Exception:
+                    errors.append(sys.exc_info())
+                    return cairo.cairo_create(
+                        cairo.cairo_image_surface_create(
+                            constants.FORMAT_INVALID, 0, 0))
+            hooks.context_create = context_create_func
+            callbacks.append(context_create_func)
+
+        if show_page is not None:
+            hooks.show_page = show_page_func = _make_page_func(
+                show_page, errors)
+            callbacks.append(show_page_func)
+        if copy_page is not None:
+            hooks.copy_page = copy_page_func = _make_page_func(
+                copy_page, errors)
+            callbacks.append(copy_page_func)
+
+        # cairo copies the struct, but the callbacks must stay alive.
+        interpreter.cairo_script_interpreter_install_hooks(
+            self._pointer, hooks)
+
+    def _check_status(self, status):
+        if self._errors:
+            exc_info = self._errors[0]
+            del self._errors[:]
+            raise exc_info[1]
+        _check_status(status)
+
+    def run(self, filename):
+        """Replay the trace in the given file.
+
+        :param filename: The name of a cairo-script file.
+
+        """
+        self._check_status(interpreter.cairo_script_interpreter_run(
+            self._pointer, _encode_filename(filename)))
+
+    def feed(self, data):
+        """Replay a chunk of trace. Chunks can be split anywhere.
+
+        :param data: A byte string.
+
+        """
+        self._check_status(interpreter.cairo_script_interpreter_feed_string(
+            self._pointer, ffi.new('char[]', data), len(data)))
+
+    def get_line_number(self):
+        """Return the line number of the trace being replayed,
+        for error reporting.
+
+        """
+        return interpreter.cairo_script_interpreter_get_line_number(
+            self._pointer)
+
+    def finish(self):
+        """Finish replaying and release the surfaces created by the trace."""
+        self._check_status(interpreter.cairo_script_interpreter_finish(
+            self._pointer))
+
+
+def _make_page_func(function, errors):
+    """Return a CFFI callback for the show_page and copy_page hooks."""
+    @ffi.callback('csi_show_page_func_t')
+    def page_func(_closure, context):
+        try:
+            function(Context._from_pointer(context, incref=True))
+        except Exception:
+            errors.append(sys.exc_info())
+    return page_func
+
+
+SURFACE_TYPE_TO_CLASS[constants.SURFACE_TYPE_SCRIPT] = ScriptSurface
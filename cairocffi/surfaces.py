@@ -13,10 +13,9 @@
 import io
 import sys
 import ctypes
-import weakref
 
 from . import ffi, cairo, _check_status, constants
-from .fonts import FontOptions, _encode_string
+from .fonts import FontOptions, KeepAlive, _encode_string
 
 
 SURFACE_TARGET_KEY = ffi.new('cairo_user_data_key_t *')
@@ -68,37 +67,6 @@ def from_buffer(obj):
         return ctypes.addressof(ctypes.c_char.from_buffer(obj)), len(obj)
 
 
-class KeepAlive(object):
-    """
-    Keep some objects alive until a callback is called.
-    :attr:`closure` is a tuple of cairo_destroy_func_t and void* cdata objects,
-    as expected by cairo_surface_set_mime_data().
-
-    Either :meth:`save` must be called before the callback,
-    or none of them must be called.
-
-    """
-    instances = set()
-
-    def __init__(self, *objects):
-        self.objects = objects
-        weakself = weakref.ref(self)
-
-        def closure(_):
-            value = weakself()
-            if value is not None:
-                value.instances.remove(value)
-
-        callback = ffi.callback(
-            'cairo_destroy_func_t', closure)
-        # cairo wants a non-NULL closure pointer.
-        self.closure = (callback, callback)
-
-    def save(self):
-        """Start keeping a reference to the passed objects."""
-        self.instances.add(self)
-
-
 class Surface(object):
     """The base class for all surface types.
 
@@ -174,6 +142,10 @@ class Surface(object):
         Use :meth:`create_similar_image` if you need an image surface
         which can be painted quickly to the target surface.
 
+        Since cairo 1.14, the new surface inherits
+        the :meth:`device scale <set_device_scale>` of this surface,
+        and :obj:`width` and :obj:`height` are multiplied by it.
+
         :param content: the :ref:`CONTENT` string for the new surface.
         :param width: width of the new surface (in device-space units)
         :param height: height of the new surface (in device-space units)
@@ -199,6 +171,11 @@ class Surface(object):
 
         Use :meth:`create_similar` if you don't need an image surface.
 
+        The :meth:`device scale <set_device_scale>` of this surface
+        is copied to the new surface,
+        so that both can be drawn with the same user-space units.
+        :obj:`width` and :obj:`height` are still in pixels.
+
         :param format: the :ref:`FORMAT` string for the new surface
         :param width: width of the new surface, (in device-space units)
         :param height: height of the new surface (in device-space units)
@@ -208,10 +185,15 @@ class Surface(object):
         :returns: A new :class:`ImageSurface` instance.
 
         """
-        return Surface._from_pointer(
+        surface = Surface._from_pointer(
             cairo.cairo_surface_create_similar_image(
                 self._pointer, content, width, height),
             incref=False)
+        if cairo.cairo_version() >= 11400:
+            scale = self.get_device_scale()
+            if scale != (1, 1):
+                surface.set_device_scale(*scale)
+        return surface
 
     def create_for_rectangle(self, x, y, width, height):
         """
@@ -321,6 +303,47 @@ class Surface(object):
             self._pointer, offsets + 0, offsets + 1)
         return tuple(offsets)
 
+    def set_device_scale(self, x_scale, y_scale):
+        """Sets a scale that is multiplied to the device coordinates
+        determined by the CTM when drawing to surface.
+
+        One common use for this is to render to very high resolution
+        display devices at a scale factor,
+        so that code that assumes 1 pixel will be a certain size
+        will still work.
+        Setting a transformation via :meth:`Context.scale`
+        isn't sufficient to do this,
+        since methods like :meth:`Context.device_to_user`
+        will expose the hidden scale.
+        It also lets cairo pick fonts hinted for the actual resolution.
+
+        Note that the scale affects drawing to the surface
+        as well as using the surface in a source pattern.
+
+        :param x_scale: The scale in the X direction, in device units
+        :param y_scale: The scale in the Y direction, in device units
+        :type x_scale: float
+        :type y_scale: float
+
+        *New in cairo 1.14.*
+
+        """
+        cairo.cairo_surface_set_device_scale(self._pointer, x_scale, y_scale)
+        self._check_status()
+
+    def get_device_scale(self):
+        """Returns the previous device scale set by :meth:`set_device_scale`.
+
+        :returns: ``(x_scale, y_scale)``
+
+        *New in cairo 1.14.*
+
+        """
+        scale = ffi.new('double[2]')
+        cairo.cairo_surface_get_device_scale(
+            self._pointer, scale + 0, scale + 1)
+        return tuple(scale)
+
     def set_fallback_resolution(self, x_pixels_per_inch, y_pixels_per_inch):
         """
         Set the horizontal and vertical resolution for image fallbacks.
@@ -1274,6 +1297,71 @@ class RecordingSurface(Surface):
         return tuple(extents)
 
 
+class TeeSurface(Surface):
+    """A tee surface redirects all drawing operations
+    to a primary surface and any number of additional target surfaces.
+
+    This makes the output of a single set of drawing calls
+    available on several backends at once,
+    for example a PNG preview and a PDF original,
+    without running the Python drawing code once for each::
+
+        pdf = PDFSurface('original.pdf', width, height)
+        preview = ImageSurface(FORMAT_ARGB32, int(width), int(height))
+        tee = TeeSurface(pdf)
+        tee.add(preview)
+        draw(Context(tee))
+        pdf.finish()
+        preview.write_to_png('preview.png')
+
+    Queries on the tee surface, such as :meth:`~Surface.get_content`
+    or :meth:`~Surface.get_font_options`,
+    are answered by the primary surface.
+
+    :param primary: The primary :class:`Surface`.
+
+    *Only available if cairo was built with the tee surface backend.*
+
+    """
+    def __init__(self, primary):
+        Surface.__init__(
+            self, cairo.cairo_tee_surface_create(primary._pointer))
+
+    def add(self, target):
+        """Add :obj:`target` to the surfaces that receive drawing operations.
+
+        :param target: A :class:`Surface` object.
+
+        """
+        cairo.cairo_tee_surface_add(self._pointer, target._pointer)
+        self._check_status()
+
+    def remove(self, target):
+        """Stop sending drawing operations to :obj:`target`.
+
+        :param target: A :class:`Surface` previously passed to :meth:`add`.
+
+        """
+        cairo.cairo_tee_surface_remove(self._pointer, target._pointer)
+        self._check_status()
+
+    def index(self, index):
+        """Return one of the surfaces of this tee surface.
+
+        :param index:
+            0 for the primary surface,
+            then 1 and up for the surfaces passed to :meth:`add`,
+            in order.
+        :type index: int
+        :returns:
+            A new instance of :class:`Surface` or one of its sub-classes,
+            a new Python object referencing the existing cairo surface.
+
+        """
+        return Surface._from_pointer(
+            cairo.cairo_tee_surface_index(self._pointer, index), incref=True)
+
+
 class Win32Surface(Surface):
     """ Creates a cairo surface that targets the given DC.
 
@@ -1333,6 +1421,7 @@ SURFACE_TYPE_TO_CLASS = {
     constants.SURFACE_TYPE_PDF: PDFSurface,
     constants.SURFACE_TYPE_SVG: SVGSurface,
     constants.SURFACE_TYPE_RECORDING: RecordingSurface,
+    constants.SURFACE_TYPE_TEE: TeeSurface,
     constants.SURFACE_TYPE_WIN32: Win32Surface,
     constants.SURFACE_TYPE_WIN32_PRINTING: Win32PrintingSurface
 }
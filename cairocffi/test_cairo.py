@@ -18,6 +18,7 @@ import math
 import array
 import base64
 import shutil
+import ctypes
 import tempfile
 import contextlib
 
@@ -109,6 +110,30 @@ def test_surface_create_similar_image():
     assert similar.get_height() == 100
 
 
+def test_device_scale():
+    if cairo_version() < 11400:
+        pytest.xfail()
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 20, 20)
+    assert surface.get_device_scale() == (1, 1)
+    surface.set_device_scale(2, 3)
+    assert surface.get_device_scale() == (2, 3)
+    context = Context(surface)
+    # The device scale is not part of the user to device transformation.
+    assert context.user_to_device(1, 1) == (1, 1)
+    context.rectangle(0, 0, 2, 2)
+    context.fill()
+    data = surface.get_data()[:]
+    assert data[:4 * 4] == pixel(b'\xff\x00\x00\x00') * 4
+    assert data[4 * 4:4 * 5] == b'\x00' * 4
+
+    similar = surface.create_similar(cairocffi.CONTENT_COLOR_ALPHA, 4, 5)
+    assert similar.get_device_scale() == (2, 3)
+    assert (similar.get_width(), similar.get_height()) == (8, 15)
+    similar = surface.create_similar_image(cairocffi.FORMAT_ARGB32, 4, 5)
+    assert similar.get_device_scale() == (2, 3)
+    assert (similar.get_width(), similar.get_height()) == (4, 5)
+
+
 def test_surface_create_for_rectangle():
     if cairo_version() < 11000:
         pytest.xfail()
@@ -431,6 +456,37 @@ def test_recording_surface_get_extents():
         assert surface.get_extents() == extents
 
 
+def test_tee_surface():
+    try:
+        cairocffi.cairo.cairo_tee_surface_create
+    except AttributeError:  # cairo built without the tee backend
+        pytest.xfail()
+    image_1 = ImageSurface(cairocffi.FORMAT_ARGB32, 4, 4)
+    image_2 = ImageSurface(cairocffi.FORMAT_ARGB32, 4, 4)
+    pdf_bytes = io.BytesIO()
+    pdf = PDFSurface(pdf_bytes, 4, 4)
+    tee = TeeSurface(image_1)
+    tee.add(image_2)
+    tee.add(pdf)
+    assert tee.index(0)._pointer == image_1._pointer
+    assert isinstance(tee.index(1), ImageSurface)
+    assert isinstance(tee.index(2), PDFSurface)
+    assert tee.get_content() == cairocffi.CONTENT_COLOR_ALPHA
+
+    context = Context(tee)
+    context.paint_with_alpha(0.5)
+    half = pixel(b'\x80\x00\x00\x00') * 16
+    assert image_1.get_data()[:] == half
+    assert image_2.get_data()[:] == half
+
+    tee.remove(image_2)
+    context.paint()
+    assert image_1.get_data()[:] == pixel(b'\xff\x00\x00\x00') * 16
+    assert image_2.get_data()[:] == half
+    pdf.finish()
+    assert pdf_bytes.getvalue().startswith(b'%PDF')
+
+
 def test_matrix():
     m = Matrix()
     with pytest.raises(AttributeError):
@@ -513,6 +569,49 @@ def test_solid_pattern():
         pattern_map[cairocffi.PATTERN_TYPE_SOLID] = SolidPattern
 
 
+def test_raster_source_pattern():
+    if cairo_version() < 11200:
+        pytest.xfail()
+    requested = []
+    released = []
+
+    def acquire(target, extents):
+        assert isinstance(target, ImageSurface)
+        requested.append(extents)
+        x, y, width, height = extents
+        tile = ImageSurface(cairocffi.FORMAT_ARGB32, width, height)
+        tile.set_device_offset(-x, -y)
+        context = Context(tile)
+        context.set_source_rgb(1, 0, 0)
+        context.paint()
+        return tile
+
+    def release(surface):
+        assert isinstance(surface, ImageSurface)
+        released.append(surface)
+
+    pattern = RasterSourcePattern(
+        cairocffi.CONTENT_COLOR_ALPHA, 1000, 1000, acquire, release)
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 4, 4)
+    context = Context(surface)
+    context.set_source(pattern)
+    assert isinstance(context.get_source(), RasterSourcePattern)
+    del pattern  # The callbacks are kept alive with the cairo pattern.
+    context.paint()
+    assert requested
+    assert len(released) == len(requested)
+    assert surface.get_data()[:] == pixel(b'\xff\xff\x00\x00') * 16
+
+    def failing_acquire(target, extents):
+        raise ZeroDivisionError
+
+    context = Context(ImageSurface(cairocffi.FORMAT_ARGB32, 4, 4))
+    context.set_source(RasterSourcePattern(
+        cairocffi.CONTENT_COLOR_ALPHA, 4, 4, failing_acquire))
+    with pytest.raises(ZeroDivisionError):
+        context.paint()
+
+
 def pdf_with_pattern(pattern=None):
     file_obj = io.BytesIO()
     surface = PDFSurface(file_obj, 100, 100)
@@ -985,6 +1084,67 @@ def test_context_font():
     # TODO: test this somehow.
 
 
+def test_user_font_face():
+    rendered = []
+
+    def init(scaled_font, context):
+        assert isinstance(scaled_font, ScaledFont)
+        assert isinstance(context, Context)
+        return (1, 0, 1, 1, 0)
+
+    def unicode_to_glyph(scaled_font, codepoint):
+        return 1 if codepoint == ord('x') else 0
+
+    def render_glyph(scaled_font, glyph, context):
+        rendered.append(glyph)
+        if glyph == 1:
+            context.rectangle(0, -1, .5, 1)
+            context.fill()
+        return .5
+
+    face = UserFontFace(render_glyph, init=init,
+                        unicode_to_glyph=unicode_to_glyph)
+    font = ScaledFont(face, Matrix(xx=10, yy=10))
+    assert isinstance(font.get_font_face(), UserFontFace)
+    assert round_tuple(font.extents()) == (10, 0, 10, 10, 0)
+    assert font.text_to_glyphs(0, 0, 'xy', with_clusters=False) == [
+        (1, 0, 0), (0, 5, 0)]
+    assert font.text_extents('xx')[4] == 10
+
+    surface = ImageSurface(cairocffi.FORMAT_A8, 20, 10)
+    context = Context(surface)
+    context.set_scaled_font(font)
+    for _ in range(3):
+        context.move_to(0, 10)
+        context.show_text('xx')
+    assert surface.get_data()[:] == (b'\xff' * 10 + b'\x00' * 10) * 10
+    # Glyphs are only rendered once, not once per draw.
+    assert rendered.count(1) == 1
+    assert len(face.glyph_cache) == len(set(rendered))
+
+    # A new cairo scaled font with the same scale reuses the recordings.
+    other_font = ScaledFont(
+        face, Matrix(xx=10, yy=10),
+        options=FontOptions(antialias=cairocffi.ANTIALIAS_NONE))
+    assert other_font.text_extents('xx')[4] == 10
+    context.set_scaled_font(other_font)
+    context.move_to(0, 10)
+    context.show_text('xx')
+    assert rendered.count(1) == 1
+    assert other_font.get_font_face().glyph_cache is face.glyph_cache
+
+    def text_to_glyphs(scaled_font, text, with_clusters):
+        glyphs = [(1, i, 0) for i in range(len(text))]
+        if with_clusters:
+            return glyphs, [(1, 1)] * len(text), 0
+        return glyphs
+
+    face = UserFontFace(render_glyph, text_to_glyphs=text_to_glyphs)
+    font = ScaledFont(face)
+    assert font.text_to_glyphs(0, 0, 'abc', with_clusters=True) == (
+        [(1, 0, 0), (1, 10, 0), (1, 20, 0)], [(1, 1)] * 3, 0)
+
+
 def test_scaled_font():
     font = ScaledFont(ToyFontFace())
     font_extents = font.extents()
@@ -1106,7 +1266,317 @@ def test_glyphs():
     assert glyph_pixels == text_pixels
 
 
+def test_glyph_run():
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 20)
+    context = Context(surface)
+    font = context.get_scaled_font()
+    text = u('Étt')
+    glyphs, clusters, is_backwards = font.text_to_glyphs(
+        5, 15, text, with_clusters=True)
+    run = font.text_to_glyph_run(5, 15, text)
+    assert len(run) == 3
+    assert run.get_glyphs() == list(run) == glyphs
+    assert run.get_clusters() == clusters
+    assert run.cluster_flags == is_backwards
+    assert run.text == text.encode('utf8')
+    assert round_tuple(font.glyph_extents(run)) == round_tuple(
+        context.glyph_extents(glyphs))
+    assert not font.text_to_glyph_run(
+        5, 15, text, with_clusters=False).has_clusters()
+
+    built = GlyphRun(glyphs, clusters, is_backwards, text)
+    assert built.get_glyphs() == glyphs
+    assert built.get_clusters() == clusters
+    assert GlyphRun([]).get_glyphs() == []
+    assert GlyphRun([]).get_clusters() is None
+
+    context.glyph_path(glyphs)
+    glyph_path = context.copy_path()
+    context.new_path()
+    context.glyph_path(run)
+    assert context.copy_path() == glyph_path
+    context.new_path()
+
+    context.show_glyphs(glyphs)
+    glyph_pixels = surface.get_data()[:]
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 20)
+    context = Context(surface)
+    context.show_glyphs(run)
+    assert surface.get_data()[:] == glyph_pixels
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 20)
+    context = Context(surface)
+    context.show_text_glyphs(None, run)
+    assert surface.get_data()[:] == glyph_pixels
+
+    moved = run.copy()
+    moved.translate(10, -2)
+    assert run.get_glyphs() == glyphs
+    assert moved.get_glyphs() == [
+        (index, x + 10, y - 2) for index, x, y in glyphs]
+    assert moved.get_clusters() == clusters
+    with pytest.raises(ValueError):
+        context.show_text_glyphs(None, GlyphRun(glyphs))
+
+
+def test_glyph_buffers():
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 20)
+    context = Context(surface)
+    font = context.get_scaled_font()
+    glyphs = font.text_to_glyphs(5, 15, 'Hello', with_clusters=False)
+    extents = round_tuple(context.glyph_extents(glyphs))
+
+    class Glyph(ctypes.Structure):
+        _fields_ = [('index', ctypes.c_ulong),
+                    ('x', ctypes.c_double), ('y', ctypes.c_double)]
+    buffer = (Glyph * len(glyphs))(*glyphs)
+    assert round_tuple(context.glyph_extents(buffer)) == extents
+    assert round_tuple(font.glyph_extents(buffer)) == extents
+    assert GlyphRun(buffer).get_glyphs() == glyphs
+    # Buffers with another layout are not reinterpreted.
+    raw = bytearray(cairocffi.ffi.buffer(
+        cairocffi.ffi.new('cairo_glyph_t[]', glyphs)))
+    with pytest.raises(TypeError):
+        context.show_glyphs(raw)
+    with pytest.raises(TypeError):
+        context.glyph_extents(bytes(raw))
+
+    indices, xs, ys = zip(*glyphs)
+    run = GlyphRun.from_arrays(indices, xs, ys)
+    assert run.get_glyphs() == glyphs
+    with pytest.raises(ValueError):
+        GlyphRun.from_arrays(indices, xs, ys[1:])
+
+    try:
+        import numpy
+    except ImportError:
+        pytest.xfail()
+    array = numpy.zeros(len(glyphs), glyph_dtype())
+    array['index'] = indices
+    array['x'] = xs
+    array['y'] = ys
+    assert round_tuple(context.glyph_extents(array)) == extents
+    with pytest.raises(TypeError):
+        context.glyph_extents(numpy.zeros((len(glyphs), 3)))
+    run = GlyphRun.from_arrays(
+        numpy.array(indices), numpy.array(xs), numpy.array(ys))
+    assert run.get_glyphs() == glyphs
+    context.show_glyphs(array)
+    array_pixels = surface.get_data()[:]
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 20)
+    Context(surface).show_glyphs(glyphs)
+    assert surface.get_data()[:] == array_pixels
+
+
+def test_scaled_font_cache():
+    context = Context(ImageSurface(cairocffi.FORMAT_ARGB32, 10, 10))
+    font = context.get_scaled_font()
+    assert font.cache_info() is None
+    extents = font.text_extents('Hello')
+    glyphs = font.text_to_glyphs(5, 15, 'Hello', with_clusters=False)
+    glyph_extents = font.glyph_extents(glyphs)
+    context_extents = context.text_extents('Hello')
+
+    font.enable_cache(maxsize=3)
+    assert font.cache_info() == (0, 0, 0, 0, 3)
+    assert font.text_extents('Hello') == extents
+    assert font.text_extents('Hello') == extents
+    assert font.cache_info() == (1, 1, 0, 1, 3)
+    # Shared by every wrapper of the same cairo scaled font.
+    other_font = context.get_scaled_font()
+    assert other_font.text_extents('Hello') == extents
+    assert other_font.cache_info().hits == 2
+    assert context.text_extents('Hello') == context_extents
+
+    result = font.text_to_glyphs(5, 15, 'Hello', with_clusters=False)
+    assert result == glyphs
+    result.append('modified')
+    assert font.text_to_glyphs(5, 15, 'Hello', with_clusters=False) == glyphs
+    assert font.glyph_extents(glyphs) == glyph_extents
+    assert font.cache_info() == (3, 4, 1, 3, 3)
+
+    font.disable_cache()
+    assert other_font.cache_info() is None
+    assert font.text_extents('Hello') == extents
+
+
+def test_measure_many():
+    context = Context(ImageSurface(cairocffi.FORMAT_ARGB32, 10, 10))
+    font = context.get_scaled_font()
+    table = font.advance_table()
+    assert set(table) == set(chr(codepoint) for codepoint in range(32, 127))
+    assert table['a'] == font.text_extents('a')[4]
+    assert context.get_scaled_font().advance_table() is table
+
+    strings = ['Hello', u('Étt'), b'World', '', 'Hello, World']
+    widths = font.measure_many(strings)
+    assert u('É') in table
+    exact = font.measure_many(strings, exact=True)
+    for string, exact_width in zip(strings, exact):
+        assert abs(exact_width - font.text_extents(string)[4]) < 1e-6
+    assert widths[3] == 0
+    for width, exact_width in zip(widths, exact):
+        assert abs(width - exact_width) < 1e-6
+
+    def text_to_glyphs(scaled_font, text, with_clusters):
+        glyphs = [(1, 10 * i, 0) for i in range(len(text) // 2)]
+        if with_clusters:
+            return glyphs, [(2, 1)] * len(glyphs), 0
+        return glyphs
+
+    face = UserFontFace(lambda *args: None, text_to_glyphs=text_to_glyphs)
+    user_font = ScaledFont(face)
+    assert all(value is None for value in user_font.advance_table().values())
+    for width, string in zip(user_font.measure_many(['abcd', 'ab']),
+                             ['abcd', 'ab']):
+        assert abs(width - user_font.text_extents(string)[4]) < 1e-6
+
+
+def test_interned_fonts(monkeypatch):
+    face = ToyFontFace.get('serif', cairocffi.FONT_SLANT_ITALIC)
+    assert ToyFontFace.get('serif', cairocffi.FONT_SLANT_ITALIC) is face
+    assert ToyFontFace.get('serif') is not face
+    assert face.get_family() == 'serif'
+
+    matrix = Matrix.init_rotate(0.5)
+    options = FontOptions(antialias=cairocffi.ANTIALIAS_GRAY)
+    font = ScaledFont.get(face, matrix, None, options)
+    assert ScaledFont.get(face, Matrix.init_rotate(0.5), None,
+                          options.copy()) is font
+    assert ScaledFont.get(face, matrix) is not font
+    assert ScaledFont.get(face, matrix, None, FontOptions()) is not font
+    assert ScaledFont.get(ToyFontFace('serif'), matrix, None, options) \
+        is not font
+    # Mutating the options after the fact does not corrupt the table.
+    options.set_antialias(cairocffi.ANTIALIAS_NONE)
+    assert ScaledFont.get(face, matrix, None, options) is not font
+    assert font.get_font_options().get_antialias() == (
+        cairocffi.ANTIALIAS_GRAY)
+
+    info = cairocffi.fonts.INTERNED_SCALED_FONTS.info()
+    assert info.hits >= 1
+    assert FontOptions() != None
+
+    # Mutating the options of a hit does not break eviction.
+    monkeypatch.setattr(cairocffi.fonts, 'INTERNED_SCALED_FONTS',
+                        cairocffi.caching.InternTable(maxsize=2))
+    options = FontOptions()
+    font = ScaledFont.get(face, matrix, None, options)
+    assert ScaledFont.get(face, matrix, None, options) is font
+    options.set_antialias(cairocffi.ANTIALIAS_NONE)
+    for size in (2, 3):
+        ScaledFont.get(face, Matrix(xx=size, yy=size))
+    assert cairocffi.fonts.INTERNED_SCALED_FONTS.info().evictions == 1
+
+
+def test_text_extents_many():
+    context = Context(ImageSurface(cairocffi.FORMAT_ARGB32, 10, 10))
+    font = context.get_scaled_font()
+    strings = ['Hello', u('Étt'), b'World', '']
+    for measure in [font, context]:
+        result = measure.text_extents_many(strings)
+        assert isinstance(result, array.array)
+        assert len(result) == 6 * len(strings)
+        assert [tuple(result[i * 6:i * 6 + 6]) for i in range(4)] == [
+            measure.text_extents(string) for string in strings]
+        assert len(measure.text_extents_many(iter([]))) == 0
+
+
+def test_glyph_atlas():
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 40)
+    context = Context(surface)
+    context.set_font_size(14)
+    font = context.get_scaled_font()
+    glyphs = font.text_to_glyphs(5, 15, 'abba', with_clusters=False)
+    atlas = GlyphAtlas(subpixel_positions=1)
+    context.show_glyphs(glyphs, atlas=atlas)
+    assert atlas.info().misses == 2  # a and b
+    assert atlas.info().hits == 2
+    atlas_pixels = surface.get_data()[:]
+    assert atlas_pixels != b'\x00' * 100 * 40 * 4
+
+    # Same glyphs, translated by whole pixels: same masks.
+    context.translate(0, 20)
+    context.show_glyphs(glyphs, atlas=atlas)
+    assert atlas.info().misses == 2
+    assert surface.get_data()[:100 * 20 * 4] == atlas_pixels[:100 * 20 * 4]
+    assert surface.get_data()[100 * 20 * 4:] == atlas_pixels[:100 * 20 * 4]
+
+    # The whole ink is drawn, compared to the normal rendering.
+    reference = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 40)
+    reference_context = Context(reference)
+    reference_context.set_font_size(14)
+    reference_context.show_glyphs(glyphs)
+    ink = [i for i, byte in enumerate(bytearray(atlas_pixels)) if byte]
+    reference_ink = [
+        i for i, byte in enumerate(bytearray(reference.get_data()[:]))
+        if byte]
+    assert abs(len(ink) - len(reference_ink)) <= len(reference_ink) // 10
+
+    small_atlas = GlyphAtlas(max_bytes=1)
+    context.show_glyphs(glyphs, atlas=small_atlas)
+    assert small_atlas.info().size == 0
+    assert small_atlas.info().evictions == small_atlas.info().misses
+
+    recording = RecordingSurface(cairocffi.CONTENT_COLOR_ALPHA, None)
+    Context(recording).show_glyphs(glyphs, atlas=atlas)
+    assert atlas.info().misses == 2
+    atlas.clear()
+    assert atlas.info().size == 0
+
+
+def test_show_text_cached():
+    text = u('Étt')
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 20)
+    context = Context(surface)
+    context.move_to(5, 15)
+    context.show_text(text)
+    context.show_text(text)
+    current_point = context.get_current_point()
+    text_pixels = surface.get_data()[:]
+
+    surface = ImageSurface(cairocffi.FORMAT_ARGB32, 100, 20)
+    context = Context(surface)
+    context.move_to(5, 15)
+    context.show_text_cached(text)
+    context.show_text_cached(text)
+    assert round_tuple(context.get_current_point()) == round_tuple(
+        current_point)
+    assert surface.get_data()[:] == text_pixels
+
+    font = context.get_scaled_font()
+    run = font.cached_glyph_run(text)
+    assert context.get_scaled_font().cached_glyph_run(text) is run
+    assert run.get_glyphs()[0][1:] == (0, 0)
+    assert run.get_clusters() == [(2, 1), (1, 1), (1, 1)]
+
+    file_obj = io.BytesIO()
+    surface = PDFSurface(file_obj, 100, 20)
+    context = Context(surface)
+    context.move_to(5, 15)
+    context.show_text_cached(text)
+    surface.finish()
+    assert b'ToUnicode' in file_obj.getvalue()
+
+
 def test_from_null_pointer():
     for class_ in [Surface, Context, Pattern, FontFace, ScaledFont]:
         with pytest.raises(ValueError):
             class_._from_pointer(cairocffi.ffi.NULL, 'unused')
+
+
+def test_api_mode():
+    try:
+        from cairocffi._ffi_api import lib
+    except ImportError:
+        pytest.xfail()
+    assert cairocffi.cairo.cairo_move_to is lib.cairo_move_to
+    assert cairocffi.cairo.cairo_get_current_point is not None
+    context = Context(ImageSurface(cairocffi.FORMAT_ARGB32, 10, 10))
+    context.move_to(1, 2)
+    context.rel_line_to(3, 4)
+    assert context.get_current_point() == (4, 6)
+    context.set_source_rgba(1, 0, 0, .5)
+    assert context.get_source().get_rgba() == (1, 0, 0, .5)
+    with pytest.raises(cairocffi.CairoError) as exc:
+        context.restore()
+    assert exc.value.status == cairocffi.STATUS_INVALID_RESTORE
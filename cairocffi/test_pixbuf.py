@@ -10,12 +10,13 @@
 
 """
 
+import io
 import base64
 import zlib
 
 import pytest
 
-from . import pixbuf, constants
+from . import pixbuf, constants, ImageSurface, Context, LinearGradient
 from .compat import pixel
 
 
@@ -28,6 +29,20 @@ JPEG_BYTES = zlib.decompress(base64.b64decode(
     b'+/YqX/O2gzdAUCUSoSJSitAUFiHdS1xArXBlr5qrf2wO58HkiigrlWK+T7TezChqU'))
 
 
+def test_load_libraries():
+    seconds = []
+    pixbuf.load_hooks.append(seconds.append)
+    try:
+        pixbuf.decode_to_image_surface(PNG_BYTES)
+        assert pixbuf.load_libraries() is None
+    finally:
+        pixbuf.load_hooks.remove(seconds.append)
+    # Libraries may have been loaded by a previous test.
+    assert len(seconds) <= 1
+    assert all(value >= 0 for value in seconds)
+    assert pixbuf.gdk_pixbuf is not None
+
+
 def test_api():
     with pytest.raises(pixbuf.ImageLoadingError):
         pixbuf.decode_to_image_surface(b'')
@@ -40,6 +55,91 @@ def test_api():
     assert_decoded(surface)
 
 
+def test_decode_file(tmpdir):
+    with pytest.raises(pixbuf.ImageLoadingError):
+        pixbuf.decode_file(io.BytesIO(b'Not a valid image.'))
+    with pytest.raises(pixbuf.ImageLoadingError):
+        pixbuf.decode_file(io.BytesIO(PNG_BYTES[:10]))
+    surface, format_name = pixbuf.decode_file(
+        io.BytesIO(PNG_BYTES), chunk_size=16)
+    assert format_name == 'png'
+    assert_decoded(surface)
+
+    filename = tmpdir.join('image.jpg')
+    filename.write_binary(JPEG_BYTES)
+    surface, format_name = pixbuf.decode_file(str(filename), chunk_size=7)
+    assert format_name == 'jpeg'
+    assert_decoded(surface, constants.FORMAT_RGB24, b'\xff\x00\x80\xff')
+
+
+def test_decode_many():
+    assert pixbuf.decode_many([]) == []
+    for max_workers in [None, 1, 3]:
+        results = pixbuf.decode_many(
+            [PNG_BYTES, b'Not a valid image.', JPEG_BYTES, PNG_BYTES[:10]],
+            max_workers=max_workers)
+        assert len(results) == 4
+        surface, format_name = results[0]
+        assert format_name == 'png'
+        assert_decoded(surface)
+        assert isinstance(results[1], pixbuf.ImageLoadingError)
+        surface, format_name = results[2]
+        assert format_name == 'jpeg'
+        assert_decoded(surface, constants.FORMAT_RGB24, b'\xff\x00\x80\xff')
+        assert isinstance(results[3], pixbuf.ImageLoadingError)
+
+
+def test_scaled_size():
+    assert pixbuf.scaled_size(300, 200) == (300, 200)
+    assert pixbuf.scaled_size(300, 200, target_size=(30, 40)) == (30, 40)
+    assert pixbuf.scaled_size(300, 200, max_size=(100, 100)) == (100, 67)
+    assert pixbuf.scaled_size(300, 200, max_size=(600, 100)) == (150, 100)
+    assert pixbuf.scaled_size(300, 200, max_size=(600, 600)) == (300, 200)
+    assert pixbuf.scaled_size(
+        300, 200, target_size=(30, 40), max_size=(15, 100)) == (15, 20)
+    assert pixbuf.scaled_size(3000, 2, max_size=(100, 100)) == (100, 1)
+
+    surface, format_name = pixbuf.decode_to_image_surface(
+        PNG_BYTES, target_size=(6, 4))
+    assert (surface.get_width(), surface.get_height()) == (6, 4)
+    surface, format_name = pixbuf.decode_file(
+        io.BytesIO(JPEG_BYTES), max_size=(2, 2))
+    assert format_name == 'jpeg'
+    assert (surface.get_width(), surface.get_height()) == (2, 1)
+    surface, format_name = pixbuf.decode_to_image_surface(
+        JPEG_BYTES, max_size=(10, 10))
+    assert (surface.get_width(), surface.get_height()) == (3, 2)
+
+
+def test_cache():
+    assert pixbuf.cache_info() is None
+    pixbuf.enable_cache()
+    try:
+        surface, format_name = pixbuf.decode_to_image_surface(PNG_BYTES)
+        assert format_name == 'png'
+        assert_decoded(surface)
+        assert pixbuf.decode_to_image_surface(PNG_BYTES) == (
+            surface, format_name)
+        other, _ = pixbuf.decode_to_image_surface(
+            PNG_BYTES, target_size=(6, 4))
+        assert other is not surface
+        assert pixbuf.cache_info() == (1, 2, 0, 2, None)
+        assert pixbuf.decode_to_image_surface(
+            PNG_BYTES, target_size=[6, 4])[0] is other
+        assert pixbuf.cache_info() == (2, 2, 0, 2, None)
+
+        # Each 3x2 image weighs 24 bytes.
+        pixbuf.enable_cache(max_bytes=40)
+        pixbuf.decode_to_image_surface(PNG_BYTES)
+        pixbuf.decode_to_image_surface(JPEG_BYTES)
+        assert pixbuf.cache_info() == (0, 2, 1, 1, None)
+        with pytest.raises(pixbuf.ImageLoadingError):
+            pixbuf.decode_to_image_surface(b'Not a valid image.')
+    finally:
+        pixbuf.disable_cache()
+    assert pixbuf.cache_info() is None
+
+
 def test_gdk():
     if pixbuf.gdk is None:
         pytest.xfail()
@@ -48,6 +148,18 @@ def test_gdk():
     assert_decoded(pixbuf.pixbuf_to_cairo_gdk(pixbuf_obj))
 
 
+def test_gdk_scratch_context(monkeypatch):
+    if pixbuf.gdk is None:
+        pytest.xfail()
+    monkeypatch.setattr(pixbuf, '_gdk_surface_from_pixbuf', None)
+    pixbuf_obj, format_name = pixbuf.decode_to_pixbuf(PNG_BYTES)
+    surface = pixbuf.pixbuf_to_cairo_gdk(pixbuf_obj)
+    assert_decoded(surface)
+    assert_decoded(pixbuf.pixbuf_to_cairo_gdk(pixbuf_obj))
+    assert pixbuf.pixbuf_to_cairo_gdk(pixbuf_obj) is not surface
+    assert_decoded(surface)
+
+
 def test_slices():
     pixbuf_obj, format_name = pixbuf.decode_to_pixbuf(PNG_BYTES)
     assert format_name == 'png'
@@ -61,6 +173,56 @@ def test_png():
                    constants.FORMAT_RGB24, b'\xff\x00\x80\xff')
 
 
+def test_rgb_to_xrgb():
+    # Two 3x2 images: without padding, and with 3 bytes of row padding.
+    pixels = b'\xff\x00\x80' * 6
+    padded = (b'\xff\x00\x80' * 3 + b'pad') * 2
+    expected = pixel(b'\xff\xff\x00\x80') * 6
+    for source, rowstride in [(pixels, 9), (padded, 12)]:
+        data = bytearray(24)
+        pixbuf._rgb_to_xrgb_slices(source, 3, 2, rowstride, data, 12)
+        assert data == expected
+    try:
+        import numpy
+    except ImportError:
+        pytest.xfail()
+    for source, rowstride in [(pixels, 9), (padded, 12)]:
+        data = bytearray(24)
+        pixbuf._rgb_to_xrgb_numpy(numpy, source, 3, 2, rowstride, data, 12)
+        assert data == expected
+
+
+def test_premultiplied():
+    pixbuf_obj, format_name = pixbuf.decode_to_pixbuf(PNG_BYTES)
+    assert_decoded(pixbuf.pixbuf_to_cairo_premultiplied(pixbuf_obj))
+
+    # Every alpha value, compared to cairo’s own PNG decoder.
+    surface = ImageSurface(constants.FORMAT_ARGB32, 256, 3)
+    context = Context(surface)
+    gradient = LinearGradient(0, 0, 256, 0)
+    gradient.add_color_stop_rgba(0, 1, .5, 0, 0)
+    gradient.add_color_stop_rgba(1, 0, .5, 1, 1)
+    context.set_source(gradient)
+    context.paint()
+    png = io.BytesIO()
+    surface.write_to_png(png)
+    expected = ImageSurface.create_from_png(io.BytesIO(png.getvalue()))
+    pixbuf_obj, format_name = pixbuf.decode_to_pixbuf(png.getvalue())
+    assert pixbuf_obj.get_has_alpha()
+    assert pixbuf.pixbuf_to_cairo_premultiplied(
+        pixbuf_obj).get_data()[:] == expected.get_data()[:]
+    width, height = 256, 3
+    pixels = cffi_buffer(pixbuf_obj)
+    assert pixbuf._rgba_to_argb32_bytes(
+        pixels, width, height, pixbuf_obj.get_rowstride()
+    ) == bytearray(expected.get_data()[:])
+
+
+def cffi_buffer(pixbuf_obj):
+    return pixbuf.ffi.buffer(
+        pixbuf_obj.get_pixels(), pixbuf_obj.get_byte_length())
+
+
 def assert_decoded(surface, format_=constants.FORMAT_ARGB32,
                    rgba=b'\x80\x00\x40\x80'):
     assert surface.get_width() == 3
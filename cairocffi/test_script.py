@@ -0,0 +1,93 @@
+# coding: utf-8
+"""
+    cairocffi.test_script
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test suite for cairocffi.script.
+
+    :copyright: Copyright 2013 by Simon Sapin
+    :license: BSD, see LICENSE for details.
+
+"""
+
+import io
+import gc
+
+import pytest
+
+from . import cairo, constants, ImageSurface, Context
+from .compat import pixel
+from . import script
+
+
+def record_trace():
+    output = io.BytesIO()
+    recorder = script.ScriptRecorder(output)
+    recorder.set_mode(constants.SCRIPT_MODE_ASCII)
+    assert recorder.get_mode() == constants.SCRIPT_MODE_ASCII
+    recorder.write_comment('cairocffi test')
+    surface = script.ScriptSurface(
+        recorder, constants.CONTENT_COLOR_ALPHA, 4, 4)
+    context = Context(surface)
+    assert isinstance(context.get_target(), script.ScriptSurface)
+    context.set_source_rgb(0, 0, 1)
+    context.paint()
+    surface.finish()
+    recorder.finish()
+    return output.getvalue()
+
+
+def test_recorder():
+    try:
+        cairo.cairo_script_create
+    except AttributeError:  # cairo built without the script backend
+        pytest.xfail()
+    trace = record_trace()
+    assert trace.startswith(b'%!CairoScript')
+    assert b'cairocffi test' in trace
+
+    output = io.BytesIO()
+    recorder = script.ScriptRecorder(output)
+    target = ImageSurface(constants.FORMAT_ARGB32, 4, 4)
+    surface = script.ScriptSurface.create_for_target(recorder, target)
+    context = Context(surface)
+    context.set_source_rgb(0, 0, 1)
+    context.paint()
+    surface.flush()
+    assert target.get_data()[:] == pixel(b'\xff\x00\x00\xff') * 16
+    surface.finish()
+    recorder.finish()
+    assert output.getvalue().startswith(b'%!CairoScript')
+
+
+def test_interpreter():
+    try:
+        cairo.cairo_script_create
+    except AttributeError:
+        pytest.xfail()
+    if script.interpreter is None:
+        pytest.xfail()
+    trace = record_trace()
+
+    surfaces = []
+
+    def surface_create(content, width, height, uid):
+        assert content == constants.CONTENT_COLOR_ALPHA
+        surfaces.append(ImageSurface(
+            constants.FORMAT_ARGB32, int(width), int(height)))
+        return surfaces[-1]
+
+    interpreter = script.ScriptInterpreter(surface_create=surface_create)
+    gc.collect()  # Callbacks must survive the constructor.
+    interpreter.feed(trace)
+    interpreter.finish()
+    assert len(surfaces) == 1
+    assert surfaces[0].get_data()[:] == pixel(b'\xff\x00\x00\xff') * 16
+
+    def failing_surface_create(content, width, height, uid):
+        raise ZeroDivisionError
+
+    interpreter = script.ScriptInterpreter(
+        surface_create=failing_surface_create)
+    with pytest.raises(ZeroDivisionError):
+        interpreter.feed(trace)
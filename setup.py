@@ -2,6 +2,7 @@ from setuptools import setup, find_packages
 from os import path
 import re
 import io
+import os
 import sys
 
 
@@ -30,8 +31,13 @@ if requires_cffi.startswith("cffi==0."):
 else:
     cffi_args = dict(cffi_modules=[
         'cairocffi/ffi_build.py:ffi',
+        'cairocffi/ffi_build.py:ffi_script',
         'cairocffi/ffi_build.py:ffi_pixbuf'
     ])
+    if os.environ.get('CAIROCFFI_API_MODE'):
+        # Requires a C compiler and the cairo headers.
+        cffi_args['cffi_modules'].append(
+            'cairocffi/ffi_build.py:build_ffi_api')
 
 try:
     import cffi
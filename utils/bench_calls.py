@@ -0,0 +1,66 @@
+# coding: utf-8
+"""
+Measure the per-call overhead of frequently called cairo functions,
+comparing the ABI-mode library to the optional API-mode module.
+
+Build the API-mode module first with::
+
+    CAIROCFFI_API_MODE=1 python setup.py build_ext --inplace
+
+Usage::
+
+    python utils/bench_calls.py [calls]
+
+"""
+
+import sys
+import timeit
+
+import cairocffi
+
+
+def bench(name, function, calls):
+    """Print the best time per call of :obj:`function`, in nanoseconds."""
+    best = min(timeit.repeat(function, number=calls, repeat=5))
+    print('    %-36s %8.0f ns' % (name, best / calls * 1e9))
+
+
+def bench_library(library, pointer, calls):
+    bench('cairo_move_to',
+          lambda: library.cairo_move_to(pointer, 1, 2), calls)
+    bench('cairo_line_to',
+          lambda: library.cairo_line_to(pointer, 3, 4), calls)
+    bench('cairo_set_source_rgba',
+          lambda: library.cairo_set_source_rgba(pointer, 1, .5, 0, .5), calls)
+
+
+def main(calls=100000):
+    surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, 10, 10)
+    context = cairocffi.Context(surface)
+    pointer = context._pointer
+
+    print('ABI mode:')
+    bench_library(
+        cairocffi.dlopen(cairocffi.ffi, 'cairo', 'cairo-2'), pointer, calls)
+    context.new_path()
+
+    try:
+        from cairocffi._ffi_api import lib
+    except ImportError:
+        print('API mode: not built.')
+    else:
+        print('API mode:')
+        bench_library(lib, pointer, calls)
+    context.new_path()
+
+    print('Context methods (%s):' % (
+        'API mode' if isinstance(cairocffi.cairo, cairocffi._CairoLibrary)
+        else 'ABI mode'))
+    bench('Context.move_to', lambda: context.move_to(1, 2), calls)
+    bench('Context.line_to', lambda: context.line_to(3, 4), calls)
+    bench('Context.set_source_rgba',
+          lambda: context.set_source_rgba(1, .5, 0, .5), calls)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,88 @@
+# coding: utf-8
+"""
+Measure the cost of importing cairocffi, with ``python -X importtime``.
+
+Each measurement runs in a new interpreter, so that nothing is cached
+in sys.modules. Usage::
+
+    python utils/bench_import.py [runs]
+
+"""
+
+import re
+import sys
+import subprocess
+
+
+STATEMENTS = [
+    'import cairocffi',
+    'import cairocffi; cairocffi.ImageSurface',
+    'import cairocffi; cairocffi.Context',
+]
+
+IMPORT_TIME_LINE = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$', re.MULTILINE)
+
+
+def import_times(statement):
+    """Run :obj:`statement` in a new interpreter.
+
+    :returns:
+        A list of ``(module_name, self_us, cumulative_us, depth)`` tuples,
+        in the order printed by ``-X importtime``.
+
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE)
+    _, stderr = process.communicate()
+    if process.returncode:
+        sys.stderr.write(stderr.decode('utf8', 'replace'))
+        raise SystemExit('Running %r failed.' % statement)
+    return [
+        (name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+        for self_us, cumulative_us, indent, name
+        in IMPORT_TIME_LINE.findall(stderr.decode('utf8', 'replace'))]
+
+
+def cairocffi_time(times):
+    """Return the total microseconds spent in cairocffi modules."""
+    # Top-level cairocffi imports, ignoring those nested in another one.
+    return sum(
+        cumulative_us for name, _, cumulative_us, depth in times
+        if name.split('.')[0] == 'cairocffi' and not any(
+            other.split('.')[0] == 'cairocffi'
+            for other in parent_names(times, name, depth)))
+
+
+def parent_names(times, name, depth):
+    """Return the names of the modules importing :obj:`name`."""
+    # -X importtime prints a module after the modules it imports.
+    index = [entry[0] for entry in times].index(name)
+    parents = []
+    for other, _, _, other_depth in times[index + 1:]:
+        if other_depth < depth:
+            parents.append(other)
+            depth = other_depth
+    return parents
+
+
+def main(runs=10):
+    if sys.version_info < (3, 7):
+        raise SystemExit('-X importtime requires Python 3.7 or later.')
+    for statement in STATEMENTS:
+        results = [import_times(statement) for _ in range(runs)]
+        best = min(results, key=cairocffi_time)
+        print('%s: best %.1f ms, median %.1f ms over %i runs' % (
+            statement, cairocffi_time(best) / 1000.,
+            sorted(cairocffi_time(times) for times in results)[runs // 2]
+            / 1000., runs))
+        for name, self_us, cumulative_us, depth in best:
+            if name.startswith('cairocffi'):
+                print('    %s%-30s %8.1f ms' % (
+                    '  ' * depth, name, cumulative_us / 1000.))
+        print('')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
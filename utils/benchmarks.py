@@ -0,0 +1,309 @@
+# coding: utf-8
+"""
+Micro-benchmarks for the hot paths of cairocffi.
+
+Usage::
+
+    python utils/benchmarks.py                        # Print timings
+    python utils/benchmarks.py -k pixbuf              # Only some benchmarks
+    python utils/benchmarks.py --save baseline.json   # Record a baseline
+    python utils/benchmarks.py --compare baseline.json --threshold 1.2
+
+With ``--compare``, the exit status is 1 if any benchmark is slower than
+the baseline by more than the threshold ratio, to catch regressions
+before a release. Baselines are only meaningful on the same machine.
+
+"""
+
+import io
+import sys
+import json
+import math
+import timeit
+import argparse
+
+import cairocffi
+from cairocffi.context import _encode_path, _iter_path
+
+
+BENCHMARKS = []
+
+
+def benchmark(function):
+    """Register a benchmark.
+
+    :obj:`function` does any setup
+    and returns the callable to time, taking no argument.
+
+    """
+    BENCHMARKS.append(function)
+    return function
+
+
+def new_context(width=100, height=100, cairo=cairocffi):
+    """Also used with pycairo by compare_pycairo_speed.py."""
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    return cairo.Context(surface)
+
+
+@benchmark
+def context_move_to():
+    context = new_context()
+    return lambda: context.move_to(10, 20)
+
+
+@benchmark
+def context_line_to_100():
+    context = new_context()
+    context.move_to(0, 0)
+
+    def run():
+        context.new_path()
+        context.move_to(0, 0)
+        for i in range(100):
+            context.line_to(i, i)
+    return run
+
+
+@benchmark
+def context_set_source_rgba():
+    context = new_context()
+    return lambda: context.set_source_rgba(1, .5, 0, .5)
+
+
+@benchmark
+def context_rectangle_fill():
+    context = new_context()
+
+    def run():
+        context.rectangle(10, 10, 50, 50)
+        context.fill()
+    return run
+
+
+def large_path():
+    return [(cairocffi.PATH_MOVE_TO, (0, 0))] + [
+        (cairocffi.PATH_CURVE_TO, (i, 0, i, 1, i + 1, 1))
+        if i % 2 else (cairocffi.PATH_LINE_TO, (i, i))
+        for i in range(10000)] + [(cairocffi.PATH_CLOSE_PATH, ())]
+
+
+@benchmark
+def encode_path_10000():
+    path = large_path()
+    return lambda: _encode_path(path)
+
+
+@benchmark
+def iter_path_10000():
+    path, data = _encode_path(large_path())
+    return lambda: list(_iter_path(path))
+
+
+@benchmark
+def context_copy_append_path_10000():
+    context = new_context()
+    context.append_path(large_path())
+
+    def run():
+        path = context.copy_path()
+        context.new_path()
+        context.append_path(path)
+    return run
+
+
+@benchmark
+def matrix_multiply():
+    matrix = cairocffi.Matrix(1, 2, 3, 4, 5, 6)
+    other = cairocffi.Matrix.init_rotate(math.pi / 3)
+    return lambda: matrix.multiply(other)
+
+
+@benchmark
+def matrix_transform_point():
+    matrix = cairocffi.Matrix.init_rotate(math.pi / 3)
+    return lambda: matrix.transform_point(10, 20)
+
+
+@benchmark
+def matrix_invert():
+    matrix = cairocffi.Matrix(1, 2, 3, 4, 5, 6)
+    return lambda: matrix.copy().invert()
+
+
+TEXT = 'The quick brown fox jumps over the lazy dog.'
+
+
+@benchmark
+def context_text_extents():
+    context = new_context()
+    context.set_font_size(12)
+    return lambda: context.text_extents(TEXT)
+
+
+@benchmark
+def scaled_font_text_to_glyphs():
+    context = new_context()
+    context.set_font_size(12)
+    font = context.get_scaled_font()
+    return lambda: font.text_to_glyphs(0, 0, TEXT, with_clusters=False)
+
+
+@benchmark
+def scaled_font_text_extents_many():
+    context = new_context()
+    context.set_font_size(12)
+    font = context.get_scaled_font()
+    strings = TEXT.split() * 100
+    return lambda: font.text_extents_many(strings)
+
+
+def drawing(cairo=cairocffi):
+    context = new_context(400, 300, cairo)
+    context.set_source_rgb(1, .5, 0)
+    context.paint()
+    context.set_source_rgba(0, 0, 1, .5)
+    context.arc(200, 150, 100, 0, 2 * math.pi)
+    context.fill()
+    return context.get_target()
+
+
+@benchmark
+def write_to_png_stream():
+    surface = drawing()
+    return lambda: surface.write_to_png(io.BytesIO())
+
+
+@benchmark
+def create_from_png_stream():
+    png_bytes = drawing().write_to_png()
+    return lambda: cairocffi.ImageSurface.create_from_png(
+        io.BytesIO(png_bytes))
+
+
+@benchmark
+def pdf_generation():
+    def run():
+        surface = cairocffi.PDFSurface(io.BytesIO(), 400, 300)
+        context = cairocffi.Context(surface)
+        for i in range(10):
+            context.rectangle(i * 10, i * 10, 100, 100)
+            context.set_source_rgb(i / 10., 0, 0)
+            context.fill()
+            context.move_to(10, 20 * i + 20)
+            context.show_text(TEXT)
+            context.show_page()
+        surface.finish()
+    return run
+
+
+def pixbuf_benchmark(format_, function_name):
+    def setup():
+        from cairocffi import pixbuf
+        surface = cairocffi.ImageSurface(format_, 400, 300)
+        context = cairocffi.Context(surface)
+        context.set_source_rgba(1, .5, 0, .5)
+        context.paint()
+        pixbuf_obj, _ = pixbuf.decode_to_pixbuf(surface.write_to_png())
+        if function_name == 'pixbuf_to_cairo_gdk' and pixbuf.gdk is None:
+            return None
+        function = getattr(pixbuf, function_name)
+        return lambda: function(pixbuf_obj)
+    setup.__name__ = function_name
+    return benchmark(setup)
+
+
+pixbuf_benchmark(cairocffi.FORMAT_ARGB32, 'pixbuf_to_cairo_gdk')
+pixbuf_benchmark(cairocffi.FORMAT_RGB24, 'pixbuf_to_cairo_slices')
+pixbuf_benchmark(cairocffi.FORMAT_ARGB32, 'pixbuf_to_cairo_premultiplied')
+pixbuf_benchmark(cairocffi.FORMAT_ARGB32, 'pixbuf_to_cairo_png')
+
+
+def time_per_call(function, repeat=5, min_time=0.1):
+    """Return the best time of :obj:`function` in seconds."""
+    number = 1
+    while True:  # Calibrate, like timeit’s command line does.
+        duration = timeit.timeit(function, number=number)
+        if duration >= min_time:
+            break
+        number *= 10
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def format_time(seconds):
+    for unit, factor in [('s', 1), ('ms', 1e3), ('us', 1e6)]:
+        if seconds >= 1 / factor:
+            return '%.2f %s' % (seconds * factor, unit)
+    return '%.0f ns' % (seconds * 1e9)
+
+
+def run_benchmarks(keyword=None, repeat=5):
+    results = {}
+    for setup in BENCHMARKS:
+        name = setup.__name__
+        if keyword and keyword not in name:
+            continue
+        try:
+            function = setup()
+        except (ImportError, OSError) as exception:
+            print('%-40s skipped: %s' % (name, exception))
+            continue
+        if function is None:
+            print('%-40s skipped' % name)
+            continue
+        results[name] = seconds = time_per_call(function, repeat)
+        print('%-40s %12s' % (name, format_time(seconds)))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the ratios to the baseline and return the regressed names."""
+    print('\nCompared to the baseline (threshold: %.2fx):' % threshold)
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name] / baseline[name]
+        marker = ''
+        if ratio > threshold:
+            regressions.append(name)
+            marker = '  REGRESSION'
+        print('%-40s %8.2fx%s' % (name, ratio, marker))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-k', dest='keyword',
+                        help='only run benchmarks with this in their name')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', metavar='FILE',
+                        help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results to a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio counted as a regression')
+    args = parser.parse_args(argv)
+
+    print('cairocffi %s, cairo %s, Python %s\n' % (
+        cairocffi.VERSION, cairocffi.cairo_version_string(),
+        sys.version.split()[0]))
+    results = run_benchmarks(args.keyword, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as fd:
+            json.dump({
+                'cairocffi': cairocffi.VERSION,
+                'cairo': cairocffi.cairo_version_string(),
+                'python': sys.version.split()[0],
+                'results': results,
+            }, fd, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = json.load(fd)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
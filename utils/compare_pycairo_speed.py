@@ -0,0 +1,230 @@
+# coding: utf-8
+"""
+Run the same drawing workloads with pycairo and with cairocffi,
+and report how much slower or faster cairocffi is for each.
+
+Workloads only use the pycairo API. For cairocffi, they run
+after :func:`cairocffi.install_as_pycairo`. Each library runs in its own
+interpreter, so that they do not share any state. Usage::
+
+    python utils/compare_pycairo_speed.py [--threshold 1.5] [-k keyword]
+
+The exit status is 1 if cairocffi is slower than pycairo
+by more than the threshold ratio for any workload,
+and 2 if pycairo is not installed.
+
+"""
+
+import io
+import sys
+import json
+import math
+import argparse
+import subprocess
+
+from benchmarks import TEXT, new_context, drawing, time_per_call
+
+
+WORKLOADS = []
+
+# Exit status of the child process when its library can not be imported.
+UNAVAILABLE = 2
+
+
+def workload(function):
+    """Register a workload.
+
+    :obj:`function` is called with the ``cairo`` module, does any setup,
+    and returns the callable to time, taking no argument.
+
+    """
+    WORKLOADS.append(function)
+    return function
+
+
+@workload
+def path_calls(cairo):
+    context = new_context(cairo=cairo)
+
+    def run():
+        context.new_path()
+        context.move_to(0, 0)
+        for i in range(100):
+            context.line_to(i, i)
+            context.rel_curve_to(1, 2, 3, 4, 5, 6)
+        context.close_path()
+    return run
+
+
+@workload
+def source_and_fill(cairo):
+    context = new_context(cairo=cairo)
+
+    def run():
+        for i in range(10):
+            context.set_source_rgba(i / 10., .5, 0, .5)
+            context.rectangle(i, i, 50, 50)
+            context.fill()
+    return run
+
+
+@workload
+def transforms(cairo):
+    context = new_context(cairo=cairo)
+
+    def run():
+        context.save()
+        context.translate(10, 20)
+        context.rotate(math.pi / 3)
+        context.scale(2, 3)
+        context.user_to_device(1, 2)
+        context.restore()
+    return run
+
+
+@workload
+def matrix_ops(cairo):
+    matrix = cairo.Matrix(1, 2, 3, 4, 5, 6)
+    other = cairo.Matrix(2, 0, 0, 2, 1, 1)
+
+    def run():
+        product = matrix.multiply(other)
+        product.translate(1, 2)
+        product.transform_point(3, 4)
+    return run
+
+
+@workload
+def copy_append_path(cairo):
+    context = new_context(cairo=cairo)
+    context.move_to(0, 0)
+    for i in range(1000):
+        context.line_to(i, i % 7)
+
+    def run():
+        path = context.copy_path()
+        context.new_path()
+        context.append_path(path)
+    return run
+
+
+@workload
+def text_extents(cairo):
+    context = new_context(cairo=cairo)
+    context.select_font_face('sans')
+    context.set_font_size(12)
+    return lambda: context.text_extents(TEXT)
+
+
+@workload
+def show_text(cairo):
+    context = new_context(400, 100, cairo)
+    context.select_font_face('sans')
+    context.set_font_size(12)
+
+    def run():
+        context.move_to(0, 50)
+        context.show_text(TEXT)
+    return run
+
+
+@workload
+def write_png(cairo):
+    surface = drawing(cairo)
+    return lambda: surface.write_to_png(io.BytesIO())
+
+
+@workload
+def read_png(cairo):
+    surface = drawing(cairo)
+    png = io.BytesIO()
+    surface.write_to_png(png)
+    png_bytes = png.getvalue()
+    return lambda: cairo.ImageSurface.create_from_png(io.BytesIO(png_bytes))
+
+
+@workload
+def pdf_output(cairo):
+    def run():
+        surface = cairo.PDFSurface(io.BytesIO(), 400, 300)
+        context = cairo.Context(surface)
+        context.select_font_face('sans')
+        for i in range(10):
+            context.set_source_rgb(i / 10., 0, 0)
+            context.rectangle(i * 10, i * 10, 100, 100)
+            context.fill()
+            context.move_to(10, 20 * i + 20)
+            context.show_text(TEXT)
+            context.show_page()
+        surface.finish()
+    return run
+
+
+def run_child(library, keyword):
+    """Run the workloads with :obj:`library` and print JSON results."""
+    if library == 'cairocffi':
+        import cairocffi
+        cairocffi.install_as_pycairo()
+    try:
+        import cairo
+    except ImportError:
+        return UNAVAILABLE
+    results = {}
+    for setup in WORKLOADS:
+        if keyword and keyword not in setup.__name__:
+            continue
+        results[setup.__name__] = time_per_call(setup(cairo))
+    json.dump(results, sys.stdout)
+    return 0
+
+
+def run_parent(library, keyword):
+    """Return the results of a child process,
+    or :obj:`None` if :obj:`library` is not available.
+
+    """
+    command = [sys.executable, __file__, '--child', library]
+    if keyword:
+        command += ['-k', keyword]
+    try:
+        output = subprocess.check_output(command)
+    except subprocess.CalledProcessError as error:
+        if error.returncode == UNAVAILABLE:
+            return None
+        raise
+    return json.loads(output.decode('ascii'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-k', dest='keyword',
+                        help='only run workloads with this in their name')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='cairocffi / pycairo ratio flagged as slower')
+    parser.add_argument('--child', choices=['pycairo', 'cairocffi'],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return run_child(args.child, args.keyword)
+
+    pycairo = run_parent('pycairo', args.keyword)
+    if pycairo is None:
+        print('pycairo is not installed, nothing to compare with.')
+        return UNAVAILABLE
+    cairocffi = run_parent('cairocffi', args.keyword)
+    print('%-20s %12s %12s %8s' % (
+        'workload', 'pycairo', 'cairocffi', 'ratio'))
+    slower = []
+    for name in sorted(pycairo):
+        ratio = cairocffi[name] / pycairo[name]
+        marker = ''
+        if ratio > args.threshold:
+            slower.append(name)
+            marker = '  SLOWER'
+        print('%-20s %9.1f us %9.1f us %7.2fx%s' % (
+            name, pycairo[name] * 1e6, cairocffi[name] * 1e6, ratio, marker))
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
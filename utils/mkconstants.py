@@ -29,8 +29,8 @@ class PrintEnumsVisitor(pycparser.c_ast.NodeVisitor):
         print('')
 
 
-def read_cairo_header(cairo_git_dir, suffix):
-    filename = os.path.join(cairo_git_dir, 'src', 'cairo%s.h' % suffix)
+def read_cairo_header(cairo_git_dir, suffix, directory='src'):
+    filename = os.path.join(cairo_git_dir, directory, 'cairo%s.h' % suffix)
     source = open(filename).read()
     source = re.sub(
         '/\*.*?\*/'
@@ -50,6 +50,8 @@ def generate(cairo_git_dir):
     source += read_cairo_header(cairo_git_dir, '-pdf')
     source += read_cairo_header(cairo_git_dir, '-ps')
     source += read_cairo_header(cairo_git_dir, '-svg')
+    source += read_cairo_header(cairo_git_dir, '-tee')
+    source += read_cairo_header(cairo_git_dir, '-script')
 
     source += '''
         typedef void* HDC;
@@ -75,6 +77,10 @@ def generate(cairo_git_dir):
     source = read_cairo_header(cairo_git_dir, '-xcb')
     print('_CAIRO_XCB_HEADERS = r"""%s"""\n' % source)
 
+    source = read_cairo_header(
+        cairo_git_dir, '-script-interpreter', 'util/cairo-script')
+    print('_CAIRO_SCRIPT_INTERPRETER_HEADERS = r"""%s"""\n' % source)
+
 
 if __name__ == '__main__':
     if len(sys.argv) >= 2: